@@ -3,6 +3,25 @@ Base agent class for 2048 game agents.
 All agents should inherit from this class and implement the next_move method.
 """
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def worker_pool(max_workers):
+    """
+    Start a process pool for an agent's parallel search.
+    
+    Workers come from a fork server (or are spawned where there is none)
+    instead of being forked from the calling process: agents may search
+    from a background thread of the GUI, and forking a multithreaded
+    process that holds a live Tk connection is unsafe.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
 
 class Agent:
     """
@@ -26,4 +45,23 @@ class Agent:
             A direction string ('up', 'down', 'left', 'right') or None if no valid moves
         """
         raise NotImplementedError("Subclasses must implement next_move method")
-
+    
+    def reset(self):
+        """
+        Prepare for a new game. Called between games when one agent plays
+        several in a row.
+        
+        Override to clear per-game state; anything that is valid for every
+        game (precomputed tables, caches keyed by board) should be kept.
+        The default does nothing.
+        """
+        pass
+    
+    def close(self):
+        """
+        Release resources the agent started, such as worker pools. Called
+        when the agent is done playing.
+        
+        The default does nothing.
+        """
+        pass
@@ -0,0 +1,291 @@
+"""
+Bitboard representation of the 4x4 2048 board.
+
+The whole board is packed into a single 64-bit integer with 4 bits per cell.
+Each nibble holds log2 of the tile value (0 for an empty cell), so tiles up to
+32768 can be represented. Row i occupies bits 16*i .. 16*i+15 and cell (i, j)
+is nibble j of that row, i.e. the low nibble of a row is its leftmost cell.
+
+Moves are resolved with lookup tables indexed by the 16-bit row value, built
+once at import time, following the layout used by nneonneo/2048-ai.
+Vertical moves transpose the board so columns become rows, then use column
+tables that scatter each result back into a 64-bit column mask.
+"""
+
+from array import array
+from game_files.logic import slide_line
+
+GRID_LEN = 4
+ROW_MASK = 0xFFFF
+MAX_RANK = 15
+
+_NIBBLE_ONES = 0x1111111111111111
+
+
+# ========================
+# LOOKUP TABLES
+# ========================
+
+# Tile value of each rank and back, for sliding rows with the game's rule
+_RANK_VALUES = tuple(1 << r if r else 0 for r in range(MAX_RANK + 1))
+_VALUE_RANKS = {value: r for r, value in enumerate(_RANK_VALUES)}
+
+
+def _slide_row_left(row):
+    """
+    Slide and merge a packed 16-bit row towards its low nibble.
+
+    The row is unpacked to tile values and slid with the game's own rule,
+    game_files.logic.slide_line.
+
+    Args:
+        row: 16-bit row value (four nibbles of tile ranks)
+
+    Returns:
+        (new_row, score_gained) tuple
+    """
+    values = [_RANK_VALUES[(row >> (4 * j)) & 0xF] for j in range(GRID_LEN)]
+    # 32768 is the largest tile a nibble can hold, so it never merges
+    merged, score = slide_line(values, max_tile=_RANK_VALUES[MAX_RANK])
+
+    new_row = 0
+    for j, value in enumerate(merged):
+        new_row |= _VALUE_RANKS[value] << (4 * j)
+    return new_row, score
+
+
+def _reverse_row(row):
+    """Reverse the order of the four nibbles in a 16-bit row."""
+    return (((row & 0xF) << 12) | ((row & 0xF0) << 4) |
+            ((row >> 4) & 0xF0) | ((row >> 12) & 0xF))
+
+
+def _row_to_col(row):
+    """Scatter a 16-bit row into column 0 of a 64-bit board."""
+    return ((row & 0xF) | ((row & 0xF0) << 12) |
+            ((row & 0xF00) << 24) | ((row & 0xF000) << 36))
+
+
+def _build_tables():
+    """Precompute move results, scores and max ranks for all 65536 rows."""
+    row_max = array('B', bytes(65536))
+    row_left = array('Q', bytes(8 * 65536))
+    row_right = array('Q', bytes(8 * 65536))
+    col_up = array('Q', bytes(8 * 65536))
+    col_down = array('Q', bytes(8 * 65536))
+    score_left = array('Q', bytes(8 * 65536))
+    score_right = array('Q', bytes(8 * 65536))
+
+    for row in range(65536):
+        left, score = _slide_row_left(row)
+        rev = _reverse_row(row)
+        right, rev_score = _slide_row_left(rev)
+        right = _reverse_row(right)
+
+        row_left[row] = left
+        row_right[row] = right
+        col_up[row] = _row_to_col(left)
+        col_down[row] = _row_to_col(right)
+        score_left[row] = score
+        score_right[rev] = rev_score
+        row_max[row] = max((row >> (4 * j)) & 0xF for j in range(GRID_LEN))
+
+    return row_left, row_right, col_up, col_down, score_left, score_right, row_max
+
+
+(ROW_LEFT, ROW_RIGHT, COL_UP, COL_DOWN,
+ SCORE_LEFT, SCORE_RIGHT, ROW_MAX_RANK) = _build_tables()
+
+
+# ========================
+# CONVERSION
+# ========================
+
+def pack(matrix):
+    """
+    Pack a 4x4 matrix of tile values into a 64-bit board.
+
+    Args:
+        matrix: The game matrix (list of lists of tile values)
+
+    Returns:
+        The packed board as an int
+
+    Raises:
+        ValueError: If the matrix is not 4x4 or holds a tile that does not
+            fit in a nibble
+    """
+    if len(matrix) != GRID_LEN or any(len(row) != GRID_LEN for row in matrix):
+        raise ValueError("Bitboards only support 4x4 grids")
+
+    board = 0
+    shift = 0
+    for row in matrix:
+        for value in row:
+            if value:
+                rank = value.bit_length() - 1
+                if rank > MAX_RANK or value != 1 << rank:
+                    raise ValueError(f"Tile {value} cannot be packed into a nibble")
+                board |= rank << shift
+            shift += 4
+    return board
+
+
+def unpack(board):
+    """
+    Unpack a 64-bit board into a 4x4 matrix of tile values.
+
+    Args:
+        board: The packed board
+
+    Returns:
+        The game matrix (list of lists of tile values)
+    """
+    matrix = []
+    for i in range(GRID_LEN):
+        row = []
+        for j in range(GRID_LEN):
+            rank = (board >> (16 * i + 4 * j)) & 0xF
+            row.append(1 << rank if rank else 0)
+        matrix.append(row)
+    return matrix
+
+
+def transpose(board):
+    """Swap rows and columns of a packed board."""
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+# ========================
+# BOARD QUERIES
+# ========================
+
+def empty_mask(board):
+    """Return a mask with bit 4*k set for every empty cell k."""
+    x = board
+    x |= (x >> 2) & 0x3333333333333333
+    x |= x >> 1
+    return ~x & _NIBBLE_ONES
+
+
+def count_empty(board):
+    """Count the empty cells of a packed board."""
+    return bin(empty_mask(board)).count('1')
+
+
+def empty_cells(board):
+    """Return the bit shifts (4 * cell index) of all empty cells."""
+    mask = empty_mask(board)
+    shifts = []
+    while mask:
+        low = mask & -mask
+        shifts.append(low.bit_length() - 1)
+        mask ^= low
+    return shifts
+
+
+def max_rank(board):
+    """Return the largest tile rank (log2 of the largest tile) on the board."""
+    return max(ROW_MAX_RANK[board & ROW_MASK],
+               ROW_MAX_RANK[(board >> 16) & ROW_MASK],
+               ROW_MAX_RANK[(board >> 32) & ROW_MASK],
+               ROW_MAX_RANK[board >> 48])
+
+
+# ========================
+# MOVES
+# ========================
+
+def move_left(board):
+    """Slide the board left. Returns (new_board, score_gained)."""
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = (board >> 48) & ROW_MASK
+    new_board = (ROW_LEFT[r0] | (ROW_LEFT[r1] << 16) |
+                 (ROW_LEFT[r2] << 32) | (ROW_LEFT[r3] << 48))
+    return new_board, SCORE_LEFT[r0] + SCORE_LEFT[r1] + SCORE_LEFT[r2] + SCORE_LEFT[r3]
+
+
+def move_right(board):
+    """Slide the board right. Returns (new_board, score_gained)."""
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = (board >> 48) & ROW_MASK
+    new_board = (ROW_RIGHT[r0] | (ROW_RIGHT[r1] << 16) |
+                 (ROW_RIGHT[r2] << 32) | (ROW_RIGHT[r3] << 48))
+    return new_board, SCORE_RIGHT[r0] + SCORE_RIGHT[r1] + SCORE_RIGHT[r2] + SCORE_RIGHT[r3]
+
+
+def move_up(board):
+    """Slide the board up. Returns (new_board, score_gained)."""
+    t = transpose(board)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = (t >> 48) & ROW_MASK
+    new_board = (COL_UP[c0] | (COL_UP[c1] << 4) |
+                 (COL_UP[c2] << 8) | (COL_UP[c3] << 12))
+    return new_board, SCORE_LEFT[c0] + SCORE_LEFT[c1] + SCORE_LEFT[c2] + SCORE_LEFT[c3]
+
+
+def move_down(board):
+    """Slide the board down. Returns (new_board, score_gained)."""
+    t = transpose(board)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = (t >> 48) & ROW_MASK
+    new_board = (COL_DOWN[c0] | (COL_DOWN[c1] << 4) |
+                 (COL_DOWN[c2] << 8) | (COL_DOWN[c3] << 12))
+    return new_board, SCORE_RIGHT[c0] + SCORE_RIGHT[c1] + SCORE_RIGHT[c2] + SCORE_RIGHT[c3]
+
+
+# Same order the agents have always tried directions in
+MOVES = (
+    ('up', move_up),
+    ('down', move_down),
+    ('left', move_left),
+    ('right', move_right),
+)
+
+
+# Moving the transposed board in one direction is the same as moving the
+# board itself in the mirrored direction
+TRANSPOSED_MOVE = {'up': 'left', 'left': 'up', 'down': 'right', 'right': 'down', None: None}
+
+
+def canonical(board):
+    """
+    Return the canonical form of a board under transposition.
+
+    Transposition is the only symmetry the agent's heuristics respect (the
+    corner term favours the top-left corner), so a board and its transpose
+    share one transposition table entry.
+
+    Returns:
+        (canonical_board, transposed) tuple; transposed is True when moves
+        found for canonical_board must be mapped with TRANSPOSED_MOVE
+    """
+    t = transpose(board)
+    if t < board:
+        return t, True
+    return board, False
+
+
+def is_terminal(board):
+    """Check if no move changes the board."""
+    if empty_mask(board):
+        return False
+    for _, move in MOVES:
+        if move(board)[0] != board:
+            return False
+    return True
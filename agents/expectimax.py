@@ -3,9 +3,118 @@ Expectimax Agent for 2048 Game
 Implements depth-limited Expectimax search with heuristic evaluation.
 """
 
-import copy
-import math
-from agents.base import Agent
+import random
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from agents.base import Agent, worker_pool
+from agents import board as bitboard
+from agents import tuple_board
+
+# The compiled search kernel (agents.search_kernel), imported on first use:
+# building or loading it and importing Numba takes seconds, which runs that
+# never search a 4x4 board should not pay
+search_kernel = None
+
+
+# Entries kept in the evaluation cache before it is flushed
+EVAL_CACHE_SIZE = 2 ** 18
+
+
+def _load_search_kernel():
+    """Import the compiled search kernel on first use; returns whether a backend is available."""
+    global search_kernel
+    if search_kernel is None:
+        from agents import search_kernel as kernel
+        search_kernel = kernel
+    return search_kernel.KERNEL_AVAILABLE
+
+
+@lru_cache(maxsize=16)
+def _modified_rank_probabilities(top_rank):
+    """Equal-probability (tile_rank, probability) pairs for ranks 1..top_rank."""
+    prob = 1.0 / top_rank
+    return tuple((rank, prob) for rank in range(1, top_rank + 1))
+
+
+@lru_cache(maxsize=16)
+def _modified_tile_probabilities(top_rank):
+    """Equal-probability (tile_value, probability) pairs for tiles 2..2**top_rank."""
+    return tuple((1 << rank, prob) for rank, prob in _modified_rank_probabilities(top_rank))
+
+
+@lru_cache(maxsize=None)
+def row_heuristic_tables(monotonicity, smoothness, merge_potential, border_penalty):
+    """
+    Precompute the weighted per-row heuristic for every packed 16-bit row.
+    
+    Monotonicity, smoothness and merge potential only look at a single row or
+    column, so on a 4x4 bitboard they reduce to one table lookup per line.
+    The border penalty only applies to the two middle cells of the two inner
+    rows, so it gets a separate table for those rows.
+    
+    Args:
+        monotonicity, smoothness, merge_potential, border_penalty: Heuristic weights
+        
+    Returns:
+        (outer, inner) tuple of array('d') tables; outer is used for the top and
+        bottom rows and for all columns, inner for the two middle rows
+    """
+    outer = array('d', bytes(8 * 65536))
+    inner = array('d', bytes(8 * 65536))
+    
+    for row in range(65536):
+        ranks = [(row >> (4 * j)) & 0xF for j in range(4)]
+        
+        # Monotonicity over the non-empty tiles (ranks sort like tile values)
+        tiles = [r for r in ranks if r != 0]
+        mono = 0
+        if len(tiles) > 1:
+            increasing = sum(1 for k in range(len(tiles) - 1) if tiles[k] <= tiles[k + 1])
+            decreasing = sum(1 for k in range(len(tiles) - 1) if tiles[k] >= tiles[k + 1])
+            mono = max(increasing, decreasing)
+        
+        # Smoothness and merges over adjacent non-empty pairs (rank is already log2)
+        smooth = 0
+        merges = 0
+        for k in range(3):
+            a, b = ranks[k], ranks[k + 1]
+            if a != 0 and b != 0:
+                smooth -= abs(a - b)
+                if a == b:
+                    merges += 1
+        
+        line = monotonicity * mono + smoothness * smooth + merge_potential * merges
+        outer[row] = line
+        
+        # Middle cells of inner rows are one step from the border
+        middle = sum(1 << r for r in ranks[1:3] if r != 0)
+        inner[row] = line - border_penalty * middle
+    
+    return outer, inner
+
+
+def _search_subtree(agent, board, depth):
+    """
+    Search the chance node below one root move in a worker process.
+    
+    Args:
+        agent: Pickled copy of the agent (caches are rebuilt on this side)
+        board: Board after the root move, packed int or tuple board
+        depth: Depth of the root max node
+        
+    Returns:
+        (score, nodes_evaluated, cache_hits) tuple
+    """
+    agent._prepare_search()
+    agent.root_depth = depth
+    if isinstance(board, int):
+        score, _ = agent.expectimax_board(board, depth - 1, is_max_node=False)
+    else:
+        score, _ = agent.expectimax(board, depth - 1, is_max_node=False)
+    return score, agent.nodes_evaluated, agent.cache_hits
 
 
 class ExpectimaxAgent(Agent):
@@ -17,7 +126,12 @@ class ExpectimaxAgent(Agent):
     - Chance nodes: Random tile placement by the game
     """
     
-    def __init__(self, depth=3, tile_distribution='standard', verbose=True):
+    # Standard 2048 spawns: 90% chance of 2, 10% chance of 4
+    STANDARD_TILE_PROBS = ((2, 0.9), (4, 0.1))
+    STANDARD_RANK_PROBS = ((1, 0.9), (2, 0.1))
+    
+    def __init__(self, depth=3, tile_distribution='standard', verbose=True, prob_threshold=None,
+                 time_limit=0.05, use_jit=True, workers=None):
         """
         Initialize the Expectimax agent.
         
@@ -25,11 +139,32 @@ class ExpectimaxAgent(Agent):
             depth: Maximum search depth (3-4 is typical, higher = slower but smarter)
             tile_distribution: 'standard' for {2:90%, 4:10%} or 'modified' for variable tiles
             verbose: If True, print debug information during gameplay
+            prob_threshold: Chance branches reached with a lower cumulative probability
+                            are cut off with a static evaluation. Defaults to 1e-3 for
+                            shallow searches (depth <= 3) and 1e-4 for deeper ones.
+            time_limit: Soft per-move time budget in seconds. The search always reaches
+                        `depth`; crowded 4x4 boards are searched one or two plies deeper
+                        only while the budget allows.
+            use_jit: Run the 4x4 search in the compiled kernel (Cython, or Numba)
+                     when one is available. The kernel is loaded by the first
+                     search (or reset)
+            workers: Number of workers searching the root moves in parallel.
+                     None (the default) searches in this process. The compiled
+                     kernel searches 4x4 boards in threads instead of processes
+                     (a compiled move is faster than the round trip to a worker
+                     process): the Cython kernel in a pool of `workers` threads,
+                     the Numba kernel in its own thread pool.
         """
         super().__init__()
         self.depth = depth
         self.tile_distribution = tile_distribution
         self.verbose = verbose
+        if prob_threshold is None:
+            prob_threshold = 1e-3 if depth <= 3 else 1e-4
+        self.cmin = prob_threshold
+        self.time_limit = time_limit
+        self.use_jit = use_jit
+        self.workers = workers
         
        
         # Empty cells should DOMINATE - be much larger than other factors
@@ -42,9 +177,31 @@ class ExpectimaxAgent(Agent):
             'border_penalty': 0.1      # Penalty for middle tiles
         }
         
+        # Transposition table: (board, is_max_node) -> (depth, score, move). Bitboards
+        # are stored in canonical form; an entry answers any query at most as deep
+        self.tt = {}
+        
+        # Evaluations of tuple boards, reused across moves while the weights match
+        self._eval_cache = {}
+        self._eval_weights = None
+        
+        # Kernel-side tables and transposition table, built on first use
+        self._kernel_tables = None
+        self._kernel_source = None
+        self._kernel_tt = None
+        
+        # Root-parallel worker pool (and the kernel's thread pool), started
+        # on first use
+        self._executor = None
+        self._threads = None
+        
         # Statistics for debugging
         self.nodes_evaluated = 0
         self.cache_hits = 0
+        self.depth_reached = 0
+        
+        # Depth of the iteration currently being searched
+        self.root_depth = depth
         
     def next_move(self, game_grid):
         """
@@ -56,65 +213,204 @@ class ExpectimaxAgent(Agent):
         Returns:
             Best direction string ('up', 'down', 'left', 'right') or None
         """
-        # Reset statistics
-        self.nodes_evaluated = 0
-        self.cache_hits = 0
+        self._prepare_search()
         
-        # Run Expectimax search
-        best_score, best_move = self.expectimax(
-            game_grid.matrix, 
-            self.depth, 
-            is_max_node=True,
-            game_grid=game_grid
-        )
+        # 4x4 boards are searched on the packed bitboard; other grid sizes
+        # (or tiles too large for a nibble) fall back to the matrix search
+        try:
+            board = bitboard.pack(game_grid.matrix)
+        except ValueError:
+            board = None
+        
+        # Run Expectimax search; the compiled kernel only handles bitboards,
+        # so other grid sizes use the worker pool whenever one is requested
+        if self.workers and (board is None or not self.use_jit):
+            self.root_depth = self.depth_reached = self.depth
+            if board is not None:
+                best_score, best_move = self.parallel_root(board, bitboard.MOVES)
+            else:
+                best_score, best_move = self.parallel_root(
+                    tuple_board.from_matrix(game_grid.matrix), tuple_board.MOVES
+                )
+        elif board is not None:
+            best_score, best_move = self.iterative_deepening(board)
+        else:
+            self.root_depth = self.depth_reached = self.depth
+            best_score, best_move = self.expectimax(
+                tuple_board.from_matrix(game_grid.matrix), 
+                self.depth, 
+                is_max_node=True
+            )
         
         # Debug output
         if self.verbose:
-            max_tile = max(max(row) for row in game_grid.matrix)
+            max_tile = max(map(max, game_grid.matrix))
             empty_cells = sum(row.count(0) for row in game_grid.matrix)
-            print(f"Move: {best_move:5s} | Heuristic: {best_score:7.1f} | Max tile: {max_tile:4d} | Empty: {empty_cells} | Nodes: {self.nodes_evaluated}")
+            print(f"Move: {best_move:5s} | Heuristic: {best_score:7.1f} | Max tile: {max_tile:4d} | Empty: {empty_cells} | Depth: {self.depth_reached} | Nodes: {self.nodes_evaluated} | Cache hits: {self.cache_hits}")
         
         return best_move
     
-    def expectimax(self, matrix, depth, is_max_node, game_grid=None):
+    def reset(self):
+        """
+        Clear per-game statistics between games and load the heuristic tables.
+        
+        The heuristic tables, the evaluation cache and the kernel tables only
+        depend on the weights, so they are kept for the next game.
         """
-        Recursive Expectimax search.
+        self._prepare_search()
+        self.depth_reached = 0
+        self.root_depth = self.depth
+    
+    def _prepare_search(self):
+        """Reset statistics and the transposition table and load the heuristic tables."""
+        # Reset statistics and the transposition table
+        self.nodes_evaluated = 0
+        self.cache_hits = 0
+        self.tt.clear()
+        
+        # Row tables are cached per weight set, so this is a dict lookup
+        # unless the weights have changed
+        self._row_tables = row_heuristic_tables(
+            self.weights['monotonicity'],
+            self.weights['smoothness'],
+            self.weights['merge_potential'],
+            self.weights['border_penalty']
+        )
+        # Without a compiled backend the 4x4 search runs in Python
+        if self.use_jit and not _load_search_kernel():
+            self.use_jit = False
+        if self.use_jit and self._kernel_source is not self._row_tables:
+            self._kernel_tables = search_kernel.make_tables(self._row_tables)
+            self._kernel_source = self._row_tables
+            self._kernel_tt = search_kernel.new_tt()
+        weights_key = tuple(sorted(self.weights.items()))
+        if weights_key != self._eval_weights:
+            self._eval_cache.clear()
+            self._eval_weights = weights_key
+    
+    def __getstate__(self):
+        # Caches, kernel objects and the worker pool are large or not
+        # picklable; the receiving side rebuilds them on its first search
+        state = self.__dict__.copy()
+        for name in ('tt', '_eval_cache', '_eval_weights', '_executor', '_threads',
+                     '_row_tables', '_kernel_tables', '_kernel_source', '_kernel_tt'):
+            state.pop(name, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.tt = {}
+        self._eval_cache = {}
+        self._eval_weights = None
+        self._executor = None
+        self._threads = None
+        self._kernel_tables = None
+        self._kernel_source = None
+        self._kernel_tt = None
+    
+    def parallel_root(self, board, moves):
+        """
+        Search the root max node with one worker task per valid move.
+        
+        Moves are applied here and only the resulting boards are sent to
+        the workers, which search the chance node below each move.
         
         Args:
-            matrix: Current game board state
+            board: Root board, packed int or tuple board
+            moves: bitboard.MOVES or tuple_board.MOVES, matching the board
+            
+        Returns:
+            (score, move) tuple
+        """
+        if self._executor is None:
+            self._executor = worker_pool(self.workers)
+        
+        tasks = []
+        for direction, move in moves:
+            result = move(board)
+            new_board, score_gained = result[0], result[1]
+            if new_board != board:
+                future = self._executor.submit(_search_subtree, self, new_board, self.depth)
+                tasks.append((direction, score_gained, future))
+        
+        if not tasks:
+            if isinstance(board, int):
+                return self.evaluate_board(board), None
+            return self.evaluate_cached(board), None
+        
+        max_score = float('-inf')
+        best_move = None
+        for direction, score_gained, future in tasks:
+            expected_score, nodes, hits = future.result()
+            self.nodes_evaluated += nodes + 1
+            self.cache_hits += hits
+            total_score = expected_score + score_gained * 0.1
+            if total_score > max_score:
+                max_score = total_score
+                best_move = direction
+        
+        return max_score, best_move
+    
+    def close(self):
+        """Shut down the root-parallel worker pools, if any were started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._threads is not None:
+            self._threads.shutdown()
+            self._threads = None
+    
+    def expectimax(self, board, depth, is_max_node, cum_prob=1.0):
+        """
+        Recursive Expectimax search on a tuple board (any grid size).
+        
+        Args:
+            board: Current game board as a tuple of row tuples
             depth: Remaining search depth
             is_max_node: True for player moves, False for chance nodes
-            game_grid: GameGrid instance (needed for move functions)
+            cum_prob: Probability of reaching this node from the root
             
         Returns:
             (score, move) tuple
         """
         self.nodes_evaluated += 1
         
-        # Base case: reached depth limit or terminal state
-        if depth == 0 or self.is_terminal(matrix):
-            return self.evaluate_state(matrix), None
+        # Base case: reached depth limit, or too unlikely to be worth
+        # searching further
+        if depth == 0 or cum_prob < self.cmin:
+            return self.evaluate_cached(board), None
+        
+        # Tuple boards are hashable, so they share the transposition table.
+        # Terminal boards are never stored, so a hit also skips that check
+        key = (board, is_max_node)
+        cached = self.tt.get(key)
+        if cached is not None and cached[0] >= depth:
+            self.cache_hits += 1
+            return cached[1], cached[2]
+        
+        if self.is_terminal(board):
+            return self.evaluate_cached(board), None
         
         if is_max_node:
             # MAX node: player chooses best move
-            return self.max_node(matrix, depth, game_grid)
+            result = self.max_node(board, depth, cum_prob)
         else:
             # CHANCE node: expected value over random tile placements
-            return self.chance_node(matrix, depth, game_grid)
+            result = self.chance_node(board, depth, cum_prob)
+        
+        self.tt[key] = (depth, result[0], result[1])
+        return result
     
-    def max_node(self, matrix, depth, game_grid):
+    def max_node(self, board, depth, cum_prob=1.0):
         """
         Handle MAX node: player choosing the best move.
         """
         max_score = float('-inf')
         best_move = None
         
-        # Try all four directions
-        for direction in ['up', 'down', 'left', 'right']:
-            # Simulate the move
-            test_matrix = copy.deepcopy(matrix)
-            move_func = game_grid.direction_map[direction]
-            new_matrix, move_valid, score_gained = move_func(test_matrix)
+        # Try all four directions; moves return new boards, so nothing to copy
+        for direction, move in tuple_board.MOVES:
+            new_board, score_gained, move_valid = move(board)
             
             # Skip invalid moves
             if not move_valid:
@@ -122,10 +418,10 @@ class ExpectimaxAgent(Agent):
             
             # Recurse to chance node (tile spawning)
             expected_score, _ = self.expectimax(
-                new_matrix, 
+                new_board, 
                 depth - 1, 
                 is_max_node=False,
-                game_grid=game_grid
+                cum_prob=cum_prob
             )
             
             # Add immediate reward from this move
@@ -138,28 +434,28 @@ class ExpectimaxAgent(Agent):
         
         # If no valid moves, return current state evaluation
         if best_move is None:
-            return self.evaluate_state(matrix), None
+            return self.evaluate_cached(board), None
         
         return max_score, best_move
     
-    def chance_node(self, matrix, depth, game_grid):
+    def chance_node(self, board, depth, cum_prob=1.0):
         """
         Handle CHANCE node: expected value over random tile spawns.
         """
         # Get empty cells
         empty_cells = []
-        n = len(matrix)
+        n = len(board)
         for i in range(n):
             for j in range(n):
-                if matrix[i][j] == 0:
+                if board[i][j] == 0:
                     empty_cells.append((i, j))
         
         # If no empty cells, game is over
         if not empty_cells:
-            return self.evaluate_state(matrix), None
+            return self.evaluate_cached(board), None
         
         # Get tile probabilities based on distribution type
-        tile_probs = self.get_tile_probabilities(matrix)
+        tile_probs = self.get_tile_probabilities(board)
         
         # Calculate expected value
         expected_value = 0.0
@@ -168,8 +464,7 @@ class ExpectimaxAgent(Agent):
         # For performance: sample empty cells if too many
         # At deep depths, evaluating all empty cells is expensive
         sample_cells = empty_cells
-        if len(empty_cells) > 6 and depth < self.depth - 1:
-            import random
+        if len(empty_cells) > 6 and depth < self.root_depth - 1:
             sample_cells = random.sample(empty_cells, 6)
             cell_probability = 1.0 / 6
         
@@ -177,20 +472,17 @@ class ExpectimaxAgent(Agent):
         for (i, j) in sample_cells:
             # Try each possible tile value
             for tile_value, tile_prob in tile_probs:
-                # Create new state with tile placed
-                new_matrix = copy.deepcopy(matrix)
-                new_matrix[i][j] = tile_value
-                
                 # Recurse to max node
+                child_prob = cell_probability * tile_prob
                 score, _ = self.expectimax(
-                    new_matrix,
+                    tuple_board.place_tile(board, i, j, tile_value),
                     depth - 1,
                     is_max_node=True,
-                    game_grid=game_grid
+                    cum_prob=cum_prob * child_prob
                 )
                 
                 # Add weighted contribution
-                expected_value += score * cell_probability * tile_prob
+                expected_value += score * child_prob
         
         return expected_value, None
     
@@ -199,57 +491,349 @@ class ExpectimaxAgent(Agent):
         Get tile spawn probabilities based on distribution type.
         
         Returns:
-            List of (tile_value, probability) tuples
+            Tuple of (tile_value, probability) tuples (shared, do not modify)
         """
         if self.tile_distribution == 'standard':
-            # Standard 2048: 90% chance of 2, 10% chance of 4
-            return [(2, 0.9), (4, 0.1)]
-        else:
-            # Modified: equal probability for all tiles up to current max
-            max_tile = max(max(row) for row in matrix)
-            if max_tile < 2:
-                max_tile = 2
-            
-            # Generate all powers of 2 up to max_tile
-            tiles = []
-            power = 1
-            while 2**power <= max_tile:
-                tiles.append(2**power)
-                power += 1
-            
-            prob = 1.0 / len(tiles)
-            return [(tile, prob) for tile in tiles]
+            return self.STANDARD_TILE_PROBS
+        
+        # Modified: equal probability for all tiles up to current max
+        max_tile = max(map(max, matrix))
+        if max_tile < 2:
+            max_tile = 2
+        return _modified_tile_probabilities(max_tile.bit_length() - 1)
     
     def is_terminal(self, matrix):
         """
         Check if the game state is terminal (no valid moves).
         """
-        n = len(matrix)
-        
-        # Check for empty cells
-        for i in range(n):
-            for j in range(n):
-                if matrix[i][j] == 0:
-                    return False
+        # Check for empty cells; this settles almost every node searched
+        if any(0 in row for row in matrix):
+            return False
         
         # Check for possible merges (horizontal)
-        for i in range(n):
-            for j in range(n - 1):
-                if matrix[i][j] == matrix[i][j + 1]:
-                    return False
+        for row in matrix:
+            if any(a == b for a, b in zip(row, row[1:])):
+                return False
         
         # Check for possible merges (vertical)
-        for i in range(n - 1):
-            for j in range(n):
-                if matrix[i][j] == matrix[i + 1][j]:
-                    return False
+        for upper, lower in zip(matrix, matrix[1:]):
+            if any(a == b for a, b in zip(upper, lower)):
+                return False
         
         return True
     
+    # ========================
+    # BITBOARD SEARCH
+    # ========================
+    
+    def iterative_deepening(self, board):
+        """
+        Search a bitboard with increasing depth, reusing the transposition table.
+        
+        Boards with few empty cells are where games are lost, so they get up to
+        two extra plies. Plies beyond `self.depth` are only started while the
+        soft time budget has not been used up.
+        
+        Returns:
+            (score, move) tuple from the deepest completed iteration
+        """
+        empties = bitboard.count_empty(board)
+        max_depth = self.depth + (1 if empties <= 4 else 0) + (1 if empties <= 2 else 0)
+        
+        if self.use_jit:
+            self._kernel_tt.clear()
+            stats = search_kernel.new_stats()
+            if self.workers and self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers)
+        
+        start = time.perf_counter()
+        result = (self.evaluate_board(board), None)
+        for depth in range(min(2, self.depth), max_depth + 1):
+            if depth > self.depth and time.perf_counter() - start > self.time_limit:
+                break
+            self.root_depth = depth
+            if self.use_jit:
+                result = search_kernel.search(
+                    board, depth, self._kernel_tables, self._kernel_tt, stats,
+                    self.weights, self.cmin, self.tile_distribution != 'standard',
+                    executor=self._threads
+                )
+            else:
+                result = self.expectimax_board(board, depth, is_max_node=True)
+            self.depth_reached = depth
+        
+        if self.use_jit:
+            self.nodes_evaluated = int(stats[0])
+            self.cache_hits = int(stats[1])
+        
+        return result
+    
+    def expectimax_board(self, board, depth, is_max_node, cum_prob=1.0):
+        """
+        Expectimax search on a packed 4x4 bitboard.
+        
+        The tree is walked with an explicit stack of node frames instead of
+        recursion: a frame is opened with its children already generated
+        (and ordered), each child's result is folded into the parent as soon
+        as it is known, and the parent's result is stored in the
+        transposition table when its last child has been folded.
+        
+        Args:
+            board: Current game board packed into a 64-bit int
+            depth: Remaining search depth
+            is_max_node: True for player moves, False for chance nodes
+            cum_prob: Probability of reaching this node from the root
+            
+        Returns:
+            (score, move) tuple
+        """
+        node = self._open_board_node(board, depth, is_max_node, cum_prob)
+        if type(node) is tuple:
+            return node
+        
+        stack = deque([node])
+        result = None
+        while stack:
+            frame = stack[-1]
+            key, transposed, is_max, node_depth, node_prob, children, index, value, best = frame
+            
+            # Fold the result of the child searched last into this frame
+            if result is not None:
+                if is_max:
+                    _, score_gained, direction = children[index - 1]
+                    total_score = result[0] + score_gained * 0.1
+                    if total_score > value:
+                        frame[7] = value = total_score
+                        frame[8] = direction
+                else:
+                    frame[7] = value = value + result[0] * children[index - 1][1]
+                result = None
+            
+            if index < len(children):
+                frame[6] = index + 1
+                if is_max:
+                    child = self._open_board_node(children[index][0], node_depth - 1, False, node_prob)
+                else:
+                    child_board, child_prob = children[index]
+                    child = self._open_board_node(child_board, node_depth - 1, True,
+                                                  node_prob * child_prob)
+                if type(child) is tuple:
+                    result = child
+                else:
+                    stack.append(child)
+                continue
+            
+            # All children folded: close the node
+            stack.pop()
+            result = (value, frame[8])
+            if transposed:
+                self.tt[key] = (node_depth, value, bitboard.TRANSPOSED_MOVE[frame[8]])
+            else:
+                self.tt[key] = (node_depth, value, frame[8])
+        
+        return result
+    
+    def _open_board_node(self, board, depth, is_max_node, cum_prob):
+        """
+        Visit a node of the bitboard search.
+        
+        Returns:
+            (score, move) tuple if the node is resolved without searching its
+            children (leaf, cutoff or table hit), otherwise a new stack frame
+            [key, transposed, is_max_node, depth, cum_prob, children,
+            next_child, value, best_move]
+        """
+        self.nodes_evaluated += 1
+        
+        # Base case: reached depth limit, or too unlikely to be worth
+        # searching further (not cached, since the cutoff depends on the
+        # path taken to reach this board)
+        if depth == 0 or cum_prob < self.cmin:
+            return self.evaluate_board(board), None
+        
+        # Same board (or its transpose) reached through a different
+        # move/spawn order, searched at least this deep; moves are stored for
+        # the canonical board. Terminal boards are never stored, so a hit
+        # also skips that check
+        canon, transposed = bitboard.canonical(board)
+        key = (canon, is_max_node)
+        cached = self.tt.get(key)
+        if cached is not None and cached[0] >= depth:
+            self.cache_hits += 1
+            if transposed:
+                return cached[1], bitboard.TRANSPOSED_MOVE[cached[2]]
+            return cached[1], cached[2]
+        
+        if bitboard.is_terminal(board):
+            return self.evaluate_board(board), None
+        
+        if depth == 1:
+            # Children are leaves: fold their evaluations here instead of
+            # pushing a frame for each of them
+            result = self.leaf_parent_board(board, is_max_node)
+        else:
+            if is_max_node:
+                children = self.max_children_board(board, depth, canon, transposed)
+                value = float('-inf')
+            else:
+                children = self.chance_children_board(board, depth)
+                value = 0.0
+            if children:
+                return [key, transposed, is_max_node, depth, cum_prob, children, 0, value, None]
+            result = (self.evaluate_board(board), None)
+        
+        if transposed:
+            self.tt[key] = (depth, result[0], bitboard.TRANSPOSED_MOVE[result[1]])
+        else:
+            self.tt[key] = (depth, result[0], result[1])
+        return result
+    
+    def leaf_parent_board(self, board, is_max_node):
+        """
+        Search a depth-1 node whose children are all evaluated statically.
+        
+        Returns:
+            (score, move) tuple
+        """
+        if is_max_node:
+            moves = []
+            for direction, move in bitboard.MOVES:
+                new_board, score_gained = move(board)
+                if new_board != board:
+                    moves.append((new_board, score_gained, direction))
+            if not moves:
+                return self.evaluate_board(board), None
+            
+            self.nodes_evaluated += len(moves)
+            scores = [self.evaluate_board(new_board) for new_board, _, _ in moves]
+            max_score = float('-inf')
+            best_move = None
+            for score, (_, score_gained, direction) in zip(scores, moves):
+                total_score = score + score_gained * 0.1
+                if total_score > max_score:
+                    max_score = total_score
+                    best_move = direction
+            return max_score, best_move
+        
+        children = self.chance_children_board(board, 1)
+        if not children:
+            return self.evaluate_board(board), None
+        self.nodes_evaluated += len(children)
+        scores = [self.evaluate_board(child) for child, _ in children]
+        return sum(score * child_prob for score, (_, child_prob) in zip(scores, children)), None
+    
+    def max_children_board(self, board, depth, canon, transposed):
+        """
+        Generate the children of a MAX node on a bitboard, best first.
+        
+        Returns:
+            List of (new_board, score_gained, direction) for the valid moves
+        """
+        moves = []
+        for direction, move in bitboard.MOVES:
+            new_board, score_gained = move(board)
+            
+            # Skip invalid moves
+            if new_board != board:
+                moves.append((direction, new_board, score_gained))
+        scores = [self.evaluate_board(new_board) for _, new_board, _ in moves]
+        candidates = [(score, direction, new_board, score_gained)
+                      for score, (direction, new_board, score_gained) in zip(scores, moves)]
+        
+        # Search the most promising move first: the best move for this board
+        # from the previous deepening iteration, then by static evaluation
+        hashed = self.tt.get((canon, True))
+        hash_move = hashed[2] if hashed is not None else None
+        if transposed:
+            hash_move = bitboard.TRANSPOSED_MOVE[hash_move]
+        candidates.sort(key=lambda c: (c[1] == hash_move, c[0]), reverse=True)
+        
+        return [(new_board, score_gained, direction)
+                for _, direction, new_board, score_gained in candidates]
+    
+    def chance_children_board(self, board, depth):
+        """
+        Generate the children of a CHANCE node on a bitboard.
+        
+        Returns:
+            List of (child_board, probability) for the searched tile spawns
+        """
+        empty_cells = bitboard.empty_cells(board)
+        
+        if not empty_cells:
+            return []
+        
+        rank_probs = self.get_rank_probabilities(board)
+        cell_probability = 1.0 / len(empty_cells)
+        
+        # Same cell sampling as the matrix search
+        sample_cells = empty_cells
+        if len(empty_cells) > 6 and depth < self.root_depth - 1:
+            sample_cells = random.sample(empty_cells, 6)
+            cell_probability = 1.0 / 6
+        
+        return [(board | (rank << shift), cell_probability * tile_prob)
+                for shift in sample_cells
+                for rank, tile_prob in rank_probs]
+    
+    def get_rank_probabilities(self, board):
+        """
+        Get tile spawn probabilities for a bitboard, keyed by tile rank (log2).
+        
+        Returns:
+            Tuple of (tile_rank, probability) tuples (shared, do not modify)
+        """
+        if self.tile_distribution == 'standard':
+            return self.STANDARD_RANK_PROBS
+        
+        return _modified_rank_probabilities(max(bitboard.max_rank(board), 1))
+    
+    def evaluate_board(self, board):
+        """
+        Evaluate a packed board with the same weighted heuristics as evaluate_state.
+        
+        Uses the per-row tables for both rows and (transposed) columns, a
+        popcount for empty cells and the four corner nibbles for max_corner.
+        """
+        outer, inner = self._row_tables
+        mask = bitboard.ROW_MASK
+        t = bitboard.transpose(board)
+        
+        total_score = (
+            outer[board & mask] + inner[(board >> 16) & mask] +
+            inner[(board >> 32) & mask] + outer[board >> 48] +
+            outer[t & mask] + outer[(t >> 16) & mask] +
+            outer[(t >> 32) & mask] + outer[t >> 48]
+        )
+        total_score += self.weights['empty_cells'] * bitboard.count_empty(board)
+        
+        top = bitboard.max_rank(board)
+        if top:
+            if board & 0xF == top:
+                corner = 4 << top
+            elif (board >> 12) & 0xF == top or (board >> 48) & 0xF == top or board >> 60 == top:
+                corner = 2 << top
+            else:
+                corner = 0
+            total_score += self.weights['max_corner'] * corner
+        
+        return total_score
+    
     # ========================
     # HEURISTIC FUNCTIONS
     # ========================
     
+    def evaluate_cached(self, board):
+        """
+        Memoized evaluate_state for hashable tuple boards.
+        """
+        score = self._eval_cache.get(board)
+        if score is None:
+            if len(self._eval_cache) >= EVAL_CACHE_SIZE:
+                self._eval_cache.clear()
+            score = self._eval_cache[board] = self.evaluate_state(board)
+        return score
+    
     def evaluate_state(self, matrix):
         """
         Evaluate a game state using weighted heuristics.
@@ -257,12 +841,7 @@ class ExpectimaxAgent(Agent):
         Returns:
             Numerical score (higher = better state)
         """
-        mono = self.monotonicity_score(matrix)
-        smooth = self.smoothness_score(matrix)
-        empty = self.empty_cells_score(matrix)
-        corner = self.max_corner_score(matrix)
-        merges = self.merge_potential_score(matrix)
-        border = self.border_penalty_score(matrix)
+        mono, smooth, empty, corner, merges, border = self.fused_scores(matrix)
         
         # Weighted combination
         total_score = (
@@ -276,6 +855,108 @@ class ExpectimaxAgent(Agent):
         
         return total_score
     
+    def fused_scores(self, matrix):
+        """
+        Compute all six heuristic terms in a single pass over the matrix.
+        
+        Gives the same values as the individual *_score methods below, which
+        are kept for inspecting terms separately.
+        
+        Returns:
+            (monotonicity, smoothness, empty_cells, max_corner, merge_potential,
+             border_penalty) tuple
+        """
+        n = len(matrix)
+        border_weights = self._border_weights(n)
+        
+        mono = 0
+        smooth = 0
+        empty = 0
+        merges = 0
+        border = 0
+        max_tile = 0
+        
+        # Last non-empty tile seen in each column, plus its monotonic pair counts
+        col_last = [0] * n
+        col_inc = [0] * n
+        col_dec = [0] * n
+        
+        for i in range(n):
+            row = matrix[i]
+            below = matrix[i + 1] if i < n - 1 else None
+            weights_row = border_weights[i]
+            last = 0
+            increasing = 0
+            decreasing = 0
+            
+            for j in range(n):
+                value = row[j]
+                if value == 0:
+                    empty += 1
+                    continue
+                
+                if value > max_tile:
+                    max_tile = value
+                border -= value * weights_row[j]
+                
+                # Monotonicity along the row and down the column
+                if last:
+                    if last <= value:
+                        increasing += 1
+                    if last >= value:
+                        decreasing += 1
+                last = value
+                
+                above = col_last[j]
+                if above:
+                    if above <= value:
+                        col_inc[j] += 1
+                    if above >= value:
+                        col_dec[j] += 1
+                col_last[j] = value
+                
+                # Smoothness and merges with the right and down neighbours
+                log_value = value.bit_length() - 1
+                if j < n - 1:
+                    right = row[j + 1]
+                    if right:
+                        smooth -= abs(log_value - (right.bit_length() - 1))
+                        if right == value:
+                            merges += 1
+                if below is not None:
+                    down = below[j]
+                    if down:
+                        smooth -= abs(log_value - (down.bit_length() - 1))
+                        if down == value:
+                            merges += 1
+            
+            mono += max(increasing, decreasing)
+        
+        for j in range(n):
+            mono += max(col_inc[j], col_dec[j])
+        
+        # Top-left corner is preferred, as in max_corner_score
+        if matrix[0][0] == max_tile:
+            corner = max_tile * 4
+        elif matrix[0][n-1] == max_tile or matrix[n-1][0] == max_tile or matrix[n-1][n-1] == max_tile:
+            corner = max_tile * 2
+        else:
+            corner = 0
+        
+        return mono, smooth, empty, corner, merges, border
+    
+    # Squared distance-from-border weights, built once per grid size
+    _BORDER_WEIGHTS = {}
+    
+    @classmethod
+    def _border_weights(cls, n):
+        """Return the n x n table of min(i, j, n-1-i, n-1-j) ** 2."""
+        weights = cls._BORDER_WEIGHTS.get(n)
+        if weights is None:
+            weights = [[min(i, j, n-1-i, n-1-j) ** 2 for j in range(n)] for i in range(n)]
+            cls._BORDER_WEIGHTS[n] = weights
+        return weights
+    
     def monotonicity_score(self, matrix):
         """
         Reward boards where tiles increase/decrease monotonically.
@@ -307,7 +988,8 @@ class ExpectimaxAgent(Agent):
     def smoothness_score(self, matrix):
         """
         Reward boards where adjacent tiles have similar values.
-        Uses log scale to compare tile values proportionally.
+        Uses log scale to compare tile values proportionally; tiles are powers
+        of two, so bit_length() - 1 is an exact integer log2.
         """
         smoothness = 0
         n = len(matrix)
@@ -315,16 +997,16 @@ class ExpectimaxAgent(Agent):
         for i in range(n):
             for j in range(n):
                 if matrix[i][j] != 0:
-                    value = math.log2(matrix[i][j])
+                    value = matrix[i][j].bit_length() - 1
                     
                     # Check right neighbor
                     if j < n - 1 and matrix[i][j + 1] != 0:
-                        target = math.log2(matrix[i][j + 1])
+                        target = matrix[i][j + 1].bit_length() - 1
                         smoothness -= abs(value - target)
                     
                     # Check down neighbor
                     if i < n - 1 and matrix[i + 1][j] != 0:
-                        target = math.log2(matrix[i + 1][j])
+                        target = matrix[i + 1][j].bit_length() - 1
                         smoothness -= abs(value - target)
         
         return smoothness
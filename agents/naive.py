@@ -4,8 +4,8 @@ These are simple heuristic agents for demonstration purposes.
 """
 
 import random
-import copy
 from agents.base import Agent
+from game_files import logic
 
 
 class RandomAgent(Agent):
@@ -27,13 +27,9 @@ class RandomAgent(Agent):
         random.shuffle(directions)
         
         for direction in directions:
-            # Check if move is valid by trying it
-            # We can check by seeing if the board would change
-            test_matrix = copy.deepcopy(game_grid.matrix)
-            move_func = game_grid.direction_map[direction]
-            new_matrix, done, score = move_func(test_matrix)
-            
-            if done:
+            # A move is valid if it would change the board; this is checked
+            # without copying or moving the matrix
+            if logic.is_move_valid(game_grid.matrix, direction):
                 return direction
         
         return None
@@ -0,0 +1,452 @@
+"""
+Numba-compiled Expectimax kernel for packed 4x4 bitboards.
+
+This mirrors ExpectimaxAgent's bitboard search (row-table moves and
+heuristics, probability cutoff, chance-cell sampling and transposition
+table) as @njit functions, so the whole recursion runs as native code.
+Numba is optional: if it (or NumPy) is not installed, NUMBA_AVAILABLE is
+False and ExpectimaxAgent keeps using its pure Python search.
+
+When Cython and a C++ compiler are available, the same search is built from
+search_kernel_cy.pyx by pyximport and used instead (CYTHON_AVAILABLE), since
+it needs no JIT warmup in each new process. The helpers at the bottom of
+this module dispatch to whichever backend is in use.
+
+Directions are numbered in the agent's search order:
+0 = up, 1 = down, 2 = left, 3 = right.
+"""
+
+import logging
+import random
+from array import array
+from agents import board as bitboard
+
+try:
+    import numpy as np
+    from numba import njit, prange, types
+    from numba.typed import Dict
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyximport
+except ImportError:
+    CYTHON_AVAILABLE = False
+else:
+    _importers = pyximport.install(language_level=3)
+    try:
+        from agents import search_kernel_cy
+        CYTHON_AVAILABLE = True
+    except Exception as error:
+        # Usually a missing C++ compiler; this module is imported once, so
+        # the failure is reported once
+        logger.warning("Could not build the Cython search kernel (%s); using %s instead",
+                       error, "the Numba kernel" if NUMBA_AVAILABLE else "the Python search")
+        CYTHON_AVAILABLE = False
+    finally:
+        pyximport.uninstall(*_importers)
+
+KERNEL_AVAILABLE = CYTHON_AVAILABLE or NUMBA_AVAILABLE
+
+DIRECTIONS = tuple(direction for direction, _ in bitboard.MOVES)
+
+
+if NUMBA_AVAILABLE:
+    # All board arithmetic stays in uint64; mixing in signed ints would make
+    # Numba promote the board to int64 (or float64)
+    _ZERO = np.uint64(0)
+    _ONE = np.uint64(1)
+    _NIBBLE = np.uint64(0xF)
+    _ROW = np.uint64(0xFFFF)
+    _ONES = np.uint64(0x1111111111111111)
+    _TWOS = np.uint64(0x3333333333333333)
+    _A1 = np.uint64(0xF0F00F0FF0F00F0F)
+    _A2 = np.uint64(0x0000F0F00000F0F0)
+    _A3 = np.uint64(0x0F0F00000F0F0000)
+    _B1 = np.uint64(0xFF00FF0000FF00FF)
+    _B2 = np.uint64(0x00FF00FF00000000)
+    _B3 = np.uint64(0x00000000FF00FF00)
+    _S2 = np.uint64(2)
+    _S12 = np.uint64(12)
+    _S16 = np.uint64(16)
+    _S24 = np.uint64(24)
+    _S32 = np.uint64(32)
+    _S48 = np.uint64(48)
+    _S60 = np.uint64(60)
+    _TT_KEY = types.UniTuple(types.uint64, 2)
+
+    @njit(cache=True)
+    def transpose(board):
+        """Swap rows and columns of a packed board."""
+        a1 = board & _A1
+        a2 = board & _A2
+        a3 = board & _A3
+        a = a1 | (a2 << _S12) | (a3 >> _S12)
+        b1 = a & _B1
+        b2 = a & _B2
+        b3 = a & _B3
+        return b1 | (b2 >> _S24) | (b3 << _S24)
+
+    @njit(cache=True)
+    def empty_mask(board):
+        """Return a mask with bit 4*k set for every empty cell k."""
+        x = board
+        x |= (x >> _S2) & _TWOS
+        x |= x >> _ONE
+        return ~x & _ONES
+
+    @njit(cache=True)
+    def count_empty(board):
+        """Count the empty cells of a packed board."""
+        mask = empty_mask(board)
+        count = 0
+        while mask != _ZERO:
+            mask &= mask - _ONE
+            count += 1
+        return count
+
+    @njit(cache=True)
+    def max_rank(board, tables):
+        """Return the largest tile rank on the board."""
+        row_max = tables[6]
+        best = 0
+        for k in range(4):
+            rank = np.int64(row_max[(board >> np.uint64(16 * k)) & _ROW])
+            if rank > best:
+                best = rank
+        return best
+
+    @njit(cache=True)
+    def execute_move(board, direction, tables):
+        """Apply a move. Returns (new_board, score_gained)."""
+        new_board = _ZERO
+        score = 0.0
+        if direction < 2:
+            # Vertical moves work on the transposed board's rows
+            t = transpose(board)
+            cols = tables[2] if direction == 0 else tables[3]
+            scores = tables[4] if direction == 0 else tables[5]
+            for k in range(4):
+                line = (t >> np.uint64(16 * k)) & _ROW
+                new_board |= cols[line] << np.uint64(4 * k)
+                score += scores[line]
+        else:
+            rows = tables[0] if direction == 2 else tables[1]
+            scores = tables[4] if direction == 2 else tables[5]
+            for k in range(4):
+                shift = np.uint64(16 * k)
+                line = (board >> shift) & _ROW
+                new_board |= rows[line] << shift
+                score += scores[line]
+        return new_board, score
+
+    @njit(cache=True)
+    def is_terminal(board, tables):
+        """Check if no move changes the board."""
+        if empty_mask(board) != _ZERO:
+            return False
+        for direction in range(4):
+            new_board, _ = execute_move(board, direction, tables)
+            if new_board != board:
+                return False
+        return True
+
+    @njit(cache=True)
+    def evaluate(board, tables, w_empty, w_corner):
+        """Weighted heuristic evaluation using the per-row tables."""
+        outer = tables[7]
+        inner = tables[8]
+        t = transpose(board)
+
+        score = (outer[board & _ROW] + inner[(board >> _S16) & _ROW] +
+                 inner[(board >> _S32) & _ROW] + outer[board >> _S48] +
+                 outer[t & _ROW] + outer[(t >> _S16) & _ROW] +
+                 outer[(t >> _S32) & _ROW] + outer[t >> _S48])
+        score += w_empty * count_empty(board)
+
+        top = max_rank(board, tables)
+        if top > 0:
+            utop = np.uint64(top)
+            if board & _NIBBLE == utop:
+                score += w_corner * (4 << top)
+            elif ((board >> _S12) & _NIBBLE == utop or (board >> _S48) & _NIBBLE == utop
+                  or board >> _S60 == utop):
+                score += w_corner * (2 << top)
+        return score
+
+    # Recursive functions cannot be loaded back from Numba's on-disk cache,
+    # so these two are compiled once per process
+    @njit
+    def expectimax(board, depth, is_max_node, cum_prob, root_depth, tables, tt, stats,
+                   w_empty, w_corner, cmin, modified):
+        """
+        Recursive Expectimax search; returns the node's expected score.
+
+        stats[0] counts nodes visited and stats[1] transposition table hits.
+        """
+        stats[0] += 1
+
+        if depth == 0 or is_terminal(board, tables):
+            return evaluate(board, tables, w_empty, w_corner)
+
+        if cum_prob < cmin:
+            return evaluate(board, tables, w_empty, w_corner)
+
+        # A board and its transpose have the same value, so they share an entry
+        key = (min(board, transpose(board)), np.uint64(2 * depth + (1 if is_max_node else 0)))
+        if key in tt:
+            stats[1] += 1
+            return tt[key]
+
+        if is_max_node:
+            result = -np.inf
+            for direction in range(4):
+                new_board, gained = execute_move(board, direction, tables)
+                if new_board == board:
+                    continue
+                value = expectimax(new_board, depth - 1, False, cum_prob, root_depth, tables,
+                                   tt, stats, w_empty, w_corner, cmin, modified)
+                value += gained * 0.1
+                if value > result:
+                    result = value
+            if result == -np.inf:
+                result = evaluate(board, tables, w_empty, w_corner)
+        else:
+            mask = empty_mask(board)
+            shifts = np.empty(16, dtype=np.uint64)
+            n_empty = 0
+            for k in range(16):
+                if (mask >> np.uint64(4 * k)) & _ONE:
+                    shifts[n_empty] = np.uint64(4 * k)
+                    n_empty += 1
+            if n_empty == 0:
+                return evaluate(board, tables, w_empty, w_corner)
+
+            # Same cell sampling as the Python search (partial Fisher-Yates)
+            n_cells = n_empty
+            if n_empty > 6 and depth < root_depth - 1:
+                n_cells = 6
+                for k in range(n_cells):
+                    swap = np.random.randint(k, n_empty)
+                    tmp = shifts[k]
+                    shifts[k] = shifts[swap]
+                    shifts[swap] = tmp
+            cell_probability = 1.0 / n_cells
+
+            if modified:
+                top = max(max_rank(board, tables), 1)
+            else:
+                top = 2
+
+            result = 0.0
+            for k in range(n_cells):
+                for rank in range(1, top + 1):
+                    if modified:
+                        tile_prob = 1.0 / top
+                    else:
+                        tile_prob = 0.9 if rank == 1 else 0.1
+                    child_prob = cell_probability * tile_prob
+                    child = board | (np.uint64(rank) << shifts[k])
+                    result += child_prob * expectimax(child, depth - 1, True,
+                                                      cum_prob * child_prob, root_depth,
+                                                      tables, tt, stats, w_empty, w_corner,
+                                                      cmin, modified)
+
+        tt[key] = result
+        return result
+
+    @njit
+    def search_root(board, depth, tables, tt, stats, w_empty, w_corner, cmin, modified):
+        """
+        Search the root max node.
+
+        Returns:
+            (score, direction) tuple; direction is -1 if no move is valid
+        """
+        best_score = -np.inf
+        best_direction = -1
+        for direction in range(4):
+            new_board, gained = execute_move(board, direction, tables)
+            if new_board == board:
+                continue
+            value = expectimax(new_board, depth - 1, False, 1.0, depth, tables, tt, stats,
+                               w_empty, w_corner, cmin, modified)
+            value += gained * 0.1
+            if value > best_score:
+                best_score = value
+                best_direction = direction
+        if best_direction < 0:
+            best_score = evaluate(board, tables, w_empty, w_corner)
+        return best_score, best_direction
+
+    @njit(parallel=True)
+    def search_root_parallel(board, depth, tables, stats, w_empty, w_corner, cmin, modified):
+        """
+        Search the root max node with the four moves in parallel threads.
+        
+        Each move gets its own transposition table and counters, so the
+        threads share nothing but the read-only tables.
+        
+        Returns:
+            (score, direction) tuple; direction is -1 if no move is valid
+        """
+        values = np.full(4, -np.inf)
+        counts = np.zeros((4, 2), dtype=np.int64)
+        for direction in prange(4):
+            new_board, gained = execute_move(board, direction, tables)
+            if new_board != board:
+                tt = Dict.empty(key_type=_TT_KEY, value_type=types.float64)
+                values[direction] = expectimax(new_board, depth - 1, False, 1.0, depth, tables,
+                                               tt, counts[direction], w_empty, w_corner,
+                                               cmin, modified) + gained * 0.1
+        
+        best_score = -np.inf
+        best_direction = -1
+        for direction in range(4):
+            stats[0] += counts[direction, 0]
+            stats[1] += counts[direction, 1]
+            if values[direction] > best_score:
+                best_score = values[direction]
+                best_direction = direction
+        if best_direction < 0:
+            best_score = evaluate(board, tables, w_empty, w_corner)
+        return best_score, best_direction
+
+
+def make_tables(row_tables):
+    """
+    Wrap the bitboard move tables and an agent's row heuristic tables as
+    NumPy arrays (zero-copy views of the underlying array buffers).
+
+    Args:
+        row_tables: (outer, inner) tuple from row_heuristic_tables
+
+    Returns:
+        Tuple of arrays in the order the kernel expects (a Tables object for
+        the Cython kernel)
+    """
+    if CYTHON_AVAILABLE:
+        return search_kernel_cy.Tables(row_tables)
+    outer, inner = row_tables
+    return (
+        np.frombuffer(bitboard.ROW_LEFT, dtype=np.uint64),
+        np.frombuffer(bitboard.ROW_RIGHT, dtype=np.uint64),
+        np.frombuffer(bitboard.COL_UP, dtype=np.uint64),
+        np.frombuffer(bitboard.COL_DOWN, dtype=np.uint64),
+        np.frombuffer(bitboard.SCORE_LEFT, dtype=np.uint64).astype(np.float64),
+        np.frombuffer(bitboard.SCORE_RIGHT, dtype=np.uint64).astype(np.float64),
+        np.frombuffer(bitboard.ROW_MAX_RANK, dtype=np.uint8),
+        np.frombuffer(outer, dtype=np.float64),
+        np.frombuffer(inner, dtype=np.float64),
+    )
+
+
+def new_tt():
+    """Create an empty typed transposition table for the kernel."""
+    if CYTHON_AVAILABLE:
+        return search_kernel_cy.TranspositionTable()
+    return Dict.empty(
+        key_type=_TT_KEY,
+        value_type=types.float64,
+    )
+
+
+def new_stats():
+    """Create the [nodes_evaluated, cache_hits] counter array for the kernel."""
+    if CYTHON_AVAILABLE:
+        return array('q', [0, 0])
+    return np.zeros(2, dtype=np.int64)
+
+
+def _search_moves_threaded(board, depth, tables, stats, weights, cmin, modified, executor):
+    """
+    Search the root moves of a board as one Cython task each on `executor`.
+
+    search_move runs without the GIL, so the moves are searched at the same
+    time. Every move gets its own transposition table and seed.
+
+    Returns:
+        (score, direction) tuple; direction is -1 if no move is valid
+    """
+    w_empty = float(weights['empty_cells'])
+    w_corner = float(weights['max_corner'])
+    tasks = []
+    for direction, (_, move) in enumerate(bitboard.MOVES):
+        new_board, gained = move(board)
+        if new_board != board:
+            move_stats = new_stats()
+            future = executor.submit(
+                search_kernel_cy.search_move, new_board, depth, tables,
+                search_kernel_cy.TranspositionTable(), move_stats, w_empty, w_corner,
+                float(cmin), modified, random.getrandbits(64)
+            )
+            tasks.append((direction, gained, move_stats, future))
+    if not tasks:
+        # No valid move: the serial search returns the board's evaluation
+        return search_kernel_cy.search_board(
+            board, depth, tables, search_kernel_cy.TranspositionTable(), stats,
+            w_empty, w_corner, float(cmin), modified, 0
+        )
+
+    best_score = float('-inf')
+    best_direction = -1
+    for direction, gained, move_stats, future in tasks:
+        value = future.result() + gained * 0.1
+        stats[0] += move_stats[0]
+        stats[1] += move_stats[1]
+        if value > best_score:
+            best_score = value
+            best_direction = direction
+    return best_score, best_direction
+
+
+def search(board, depth, tables, tt, stats, weights, cmin, modified, executor=None):
+    """
+    Run a full-depth compiled search from a packed board.
+
+    Args:
+        board: Packed board (Python int)
+        depth: Search depth
+        tables: Tables from make_tables
+        tt: Typed transposition table from new_tt
+        stats: Counter array from new_stats
+        weights: The agent's heuristic weights dict
+        cmin: Cumulative probability cutoff
+        modified: True for the scaling tile distribution
+        executor: ThreadPoolExecutor for searching the root moves in
+                  parallel, or None to search them in turn. The Cython
+                  backend runs one task per move on it; the Numba backend
+                  uses its own threads instead. Parallel searches do not
+                  use `tt`.
+
+    Returns:
+        (score, move) tuple, with move a direction string or None
+    """
+    if CYTHON_AVAILABLE and executor is not None:
+        score, direction = _search_moves_threaded(
+            board, depth, tables, stats, weights, cmin, modified, executor
+        )
+    elif CYTHON_AVAILABLE:
+        # Cell sampling draws from a generator seeded here, so random.seed
+        # still makes games reproducible
+        score, direction = search_kernel_cy.search_board(
+            board, depth, tables, tt, stats,
+            float(weights['empty_cells']), float(weights['max_corner']),
+            float(cmin), modified, random.getrandbits(64)
+        )
+    elif executor is not None:
+        score, direction = search_root_parallel(
+            np.uint64(board), depth, tables, stats,
+            float(weights['empty_cells']), float(weights['max_corner']),
+            float(cmin), modified
+        )
+    else:
+        score, direction = search_root(
+            np.uint64(board), depth, tables, tt, stats,
+            float(weights['empty_cells']), float(weights['max_corner']),
+            float(cmin), modified
+        )
+    return score, DIRECTIONS[direction] if direction >= 0 else None
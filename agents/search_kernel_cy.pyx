@@ -0,0 +1,351 @@
+# distutils: language = c++
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Cython build of the 4x4 Expectimax kernel.
+
+Same search as the Numba kernel in search_kernel.py (row-table moves and
+heuristics, probability cutoff, chance-cell sampling and a transposition
+table keyed by the canonical board), compiled ahead of time by pyximport
+on first import, so there is no per-process JIT warmup. The tree walk runs
+without the GIL.
+
+Directions are numbered in the agent's search order:
+0 = up, 1 = down, 2 = left, 3 = right.
+"""
+
+from cython.operator cimport dereference as deref
+from libc.stdint cimport uint8_t, uint64_t
+from libcpp.unordered_map cimport unordered_map
+from libcpp.vector cimport vector
+
+from agents import board as bitboard
+
+ctypedef unordered_map[uint64_t, double] Level
+ctypedef vector[Level] Table
+
+cdef uint64_t ROW_LEFT[65536]
+cdef uint64_t ROW_RIGHT[65536]
+cdef uint64_t COL_UP[65536]
+cdef uint64_t COL_DOWN[65536]
+cdef double SCORE_LEFT[65536]
+cdef double SCORE_RIGHT[65536]
+cdef uint8_t ROW_MAX[65536]
+
+
+cdef void _load_move_tables(unsigned long long[:] row_left, unsigned long long[:] row_right,
+                            unsigned long long[:] col_up, unsigned long long[:] col_down,
+                            unsigned long long[:] score_left, unsigned long long[:] score_right,
+                            unsigned char[:] row_max):
+    cdef int row
+    for row in range(65536):
+        ROW_LEFT[row] = row_left[row]
+        ROW_RIGHT[row] = row_right[row]
+        COL_UP[row] = col_up[row]
+        COL_DOWN[row] = col_down[row]
+        SCORE_LEFT[row] = <double>score_left[row]
+        SCORE_RIGHT[row] = <double>score_right[row]
+        ROW_MAX[row] = row_max[row]
+
+
+_load_move_tables(bitboard.ROW_LEFT, bitboard.ROW_RIGHT, bitboard.COL_UP, bitboard.COL_DOWN,
+                  bitboard.SCORE_LEFT, bitboard.SCORE_RIGHT, bitboard.ROW_MAX_RANK)
+
+
+cdef class Tables:
+    """Copy of an agent's (outer, inner) row heuristic tables."""
+    cdef double outer[65536]
+    cdef double inner[65536]
+
+    def __init__(self, row_tables):
+        cdef double[:] outer = row_tables[0]
+        cdef double[:] inner = row_tables[1]
+        cdef int row
+        for row in range(65536):
+            self.outer[row] = outer[row]
+            self.inner[row] = inner[row]
+
+
+cdef class TranspositionTable:
+    """One (canonical board -> score) map per 2 * depth + is_max_node."""
+    cdef Table levels
+
+    def clear(self):
+        self.levels.clear()
+
+
+cdef struct Search:
+    double *outer
+    double *inner
+    Table *tt
+    double w_empty
+    double w_corner
+    double cmin
+    int root_depth
+    bint modified
+    uint64_t rng
+    long long nodes
+    long long hits
+
+
+cdef inline uint64_t transpose(uint64_t board) noexcept nogil:
+    cdef uint64_t a = ((board & 0xF0F00F0FF0F00F0FULL) |
+                       ((board & 0x0000F0F00000F0F0ULL) << 12) |
+                       ((board & 0x0F0F00000F0F0000ULL) >> 12))
+    return ((a & 0xFF00FF0000FF00FFULL) |
+            ((a & 0x00FF00FF00000000ULL) >> 24) |
+            ((a & 0x00000000FF00FF00ULL) << 24))
+
+
+cdef inline uint64_t empty_mask(uint64_t board) noexcept nogil:
+    cdef uint64_t x = board
+    x |= (x >> 2) & 0x3333333333333333ULL
+    x |= x >> 1
+    return ~x & 0x1111111111111111ULL
+
+
+cdef inline int count_empty(uint64_t board) noexcept nogil:
+    cdef uint64_t mask = empty_mask(board)
+    cdef int count = 0
+    while mask:
+        mask &= mask - 1
+        count += 1
+    return count
+
+
+cdef inline int max_rank(uint64_t board) noexcept nogil:
+    cdef int best = 0
+    cdef int k, rank
+    for k in range(4):
+        rank = ROW_MAX[(board >> (16 * k)) & 0xFFFF]
+        if rank > best:
+            best = rank
+    return best
+
+
+cdef inline uint64_t execute_move(uint64_t board, int direction, double *score) noexcept nogil:
+    cdef uint64_t new_board = 0
+    cdef uint64_t t, line
+    cdef int k
+    score[0] = 0.0
+    if direction < 2:
+        # Vertical moves work on the transposed board's rows
+        t = transpose(board)
+        for k in range(4):
+            line = (t >> (16 * k)) & 0xFFFF
+            if direction == 0:
+                new_board |= COL_UP[line] << (4 * k)
+                score[0] += SCORE_LEFT[line]
+            else:
+                new_board |= COL_DOWN[line] << (4 * k)
+                score[0] += SCORE_RIGHT[line]
+    else:
+        for k in range(4):
+            line = (board >> (16 * k)) & 0xFFFF
+            if direction == 2:
+                new_board |= ROW_LEFT[line] << (16 * k)
+                score[0] += SCORE_LEFT[line]
+            else:
+                new_board |= ROW_RIGHT[line] << (16 * k)
+                score[0] += SCORE_RIGHT[line]
+    return new_board
+
+
+cdef inline bint is_terminal(uint64_t board) noexcept nogil:
+    cdef double gained
+    cdef int direction
+    if empty_mask(board):
+        return False
+    for direction in range(4):
+        if execute_move(board, direction, &gained) != board:
+            return False
+    return True
+
+
+cdef double evaluate(uint64_t board, Search *s) noexcept nogil:
+    cdef uint64_t t = transpose(board)
+    cdef double score = (s.outer[board & 0xFFFF] + s.inner[(board >> 16) & 0xFFFF] +
+                         s.inner[(board >> 32) & 0xFFFF] + s.outer[board >> 48] +
+                         s.outer[t & 0xFFFF] + s.outer[(t >> 16) & 0xFFFF] +
+                         s.outer[(t >> 32) & 0xFFFF] + s.outer[t >> 48])
+    cdef int top = max_rank(board)
+    score += s.w_empty * count_empty(board)
+    if top > 0:
+        if board & 0xF == <uint64_t>top:
+            score += s.w_corner * (4 << top)
+        elif ((board >> 12) & 0xF == <uint64_t>top or (board >> 48) & 0xF == <uint64_t>top
+              or board >> 60 == <uint64_t>top):
+            score += s.w_corner * (2 << top)
+    return score
+
+
+cdef inline uint64_t next_random(Search *s) noexcept nogil:
+    # xorshift64*, seeded from Python's random module for every search
+    s.rng ^= s.rng >> 12
+    s.rng ^= s.rng << 25
+    s.rng ^= s.rng >> 27
+    return s.rng * 0x2545F4914F6CDD1DULL
+
+
+cdef double expectimax(uint64_t board, int depth, bint is_max_node, double cum_prob,
+                       Search *s) noexcept nogil:
+    cdef double result, value, gained, cell_probability, tile_prob, child_prob
+    cdef uint64_t new_board, canon, child, tmp
+    cdef uint64_t mask
+    cdef uint64_t shifts[16]
+    cdef int direction, n_empty, n_cells, k, swap, rank, top, level
+    cdef Level.iterator it
+
+    s.nodes += 1
+
+    if depth == 0 or is_terminal(board):
+        return evaluate(board, s)
+
+    if cum_prob < s.cmin:
+        return evaluate(board, s)
+
+    # A board and its transpose have the same value, so they share an entry
+    canon = transpose(board)
+    if board < canon:
+        canon = board
+    level = 2 * depth + (1 if is_max_node else 0)
+    if <size_t>level >= s.tt.size():
+        s.tt.resize(level + 1)
+    it = s.tt[0][level].find(canon)
+    if it != s.tt[0][level].end():
+        s.hits += 1
+        return deref(it).second
+
+    if is_max_node:
+        result = -1e300
+        for direction in range(4):
+            new_board = execute_move(board, direction, &gained)
+            if new_board == board:
+                continue
+            value = expectimax(new_board, depth - 1, False, cum_prob, s) + gained * 0.1
+            if value > result:
+                result = value
+        if result == -1e300:
+            result = evaluate(board, s)
+    else:
+        mask = empty_mask(board)
+        n_empty = 0
+        for k in range(16):
+            if (mask >> (4 * k)) & 1:
+                shifts[n_empty] = 4 * k
+                n_empty += 1
+        if n_empty == 0:
+            return evaluate(board, s)
+
+        # Same cell sampling as the Python search (partial Fisher-Yates)
+        n_cells = n_empty
+        if n_empty > 6 and depth < s.root_depth - 1:
+            n_cells = 6
+            for k in range(n_cells):
+                swap = k + <int>(next_random(s) % <uint64_t>(n_empty - k))
+                tmp = shifts[k]
+                shifts[k] = shifts[swap]
+                shifts[swap] = tmp
+        cell_probability = 1.0 / n_cells
+
+        if s.modified:
+            top = max_rank(board)
+            if top < 1:
+                top = 1
+        else:
+            top = 2
+
+        result = 0.0
+        for k in range(n_cells):
+            for rank in range(1, top + 1):
+                if s.modified:
+                    tile_prob = 1.0 / top
+                else:
+                    tile_prob = 0.9 if rank == 1 else 0.1
+                child_prob = cell_probability * tile_prob
+                child = board | (<uint64_t>rank << shifts[k])
+                result += child_prob * expectimax(child, depth - 1, True,
+                                                  cum_prob * child_prob, s)
+
+    s.tt[0][level][canon] = result
+    return result
+
+
+cdef int search_root(uint64_t board, int depth, Search *s, double *best_score) noexcept nogil:
+    cdef double value, gained
+    cdef uint64_t new_board
+    cdef int direction
+    cdef int best_direction = -1
+    best_score[0] = -1e300
+    for direction in range(4):
+        new_board = execute_move(board, direction, &gained)
+        if new_board == board:
+            continue
+        value = expectimax(new_board, depth - 1, False, 1.0, s) + gained * 0.1
+        if value > best_score[0]:
+            best_score[0] = value
+            best_direction = direction
+    if best_direction < 0:
+        best_score[0] = evaluate(board, s)
+    return best_direction
+
+
+cdef void init_search(Search *s, int depth, Tables tables, TranspositionTable tt,
+                      double w_empty, double w_corner, double cmin, bint modified,
+                      uint64_t seed):
+    s.outer = tables.outer
+    s.inner = tables.inner
+    s.tt = &tt.levels
+    s.w_empty = w_empty
+    s.w_corner = w_corner
+    s.cmin = cmin
+    s.root_depth = depth
+    s.modified = modified
+    s.rng = seed | 1
+    s.nodes = 0
+    s.hits = 0
+
+
+def search_board(uint64_t board, int depth, Tables tables, TranspositionTable tt,
+                 long long[:] stats, double w_empty, double w_corner, double cmin,
+                 bint modified, uint64_t seed):
+    """
+    Search the root max node without holding the GIL.
+
+    stats[0] and stats[1] are incremented by the nodes visited and the
+    transposition table hits.
+
+    Returns:
+        (score, direction) tuple; direction is -1 if no move is valid
+    """
+    cdef Search s
+    cdef double score
+    cdef int direction
+    init_search(&s, depth, tables, tt, w_empty, w_corner, cmin, modified, seed)
+    with nogil:
+        direction = search_root(board, depth, &s, &score)
+    stats[0] += s.nodes
+    stats[1] += s.hits
+    return score, direction
+
+
+def search_move(uint64_t board, int depth, Tables tables, TranspositionTable tt,
+                long long[:] stats, double w_empty, double w_corner, double cmin,
+                bint modified, uint64_t seed):
+    """
+    Search the chance node below one root move without holding the GIL.
+
+    `board` is the board after the move and `depth` the depth of the root
+    max node, so several root moves can be searched from Python threads at
+    once, each with its own transposition table and stats.
+
+    Returns:
+        Expected score of the chance node (without the move's own score)
+    """
+    cdef Search s
+    cdef double score
+    init_search(&s, depth, tables, tt, w_empty, w_corner, cmin, modified, seed)
+    with nogil:
+        score = expectimax(board, depth - 1, False, 1.0, &s)
+    stats[0] += s.nodes
+    stats[1] += s.hits
+    return score
@@ -0,0 +1,67 @@
+"""
+Checks that the agents' board representations move like the game.
+
+Runs under pytest, or directly with `python -m agents.test_board` from the
+repository root.
+"""
+
+import random
+
+from agents import board as bitboard
+from agents import tuple_board
+from game_files import logic
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+
+def random_matrix(n, rng):
+    """A random n x n matrix, about half empty, with tiles up to 2048."""
+    return [[rng.choice((0, 0, 0, 2, 2, 4, 8, 16, 64, 256, 2048)) for _ in range(n)]
+            for _ in range(n)]
+
+
+def test_bitboard_moves_match_logic():
+    """Bitboard moves give the same board, score and validity as game_files.logic."""
+    rng = random.Random(0)
+    moves = dict(bitboard.MOVES)
+    for _ in range(2000):
+        matrix = random_matrix(4, rng)
+        board = bitboard.pack(matrix)
+        for direction in DIRECTIONS:
+            expected, done, score = getattr(logic, direction)([row[:] for row in matrix])
+            new_board, gained = moves[direction](board)
+            assert bitboard.unpack(new_board) == expected, (matrix, direction)
+            assert gained == score, (matrix, direction)
+            assert (new_board != board) == done, (matrix, direction)
+
+
+def test_tuple_board_moves_match_logic():
+    """Tuple-board moves give the same board, score and validity as game_files.logic."""
+    rng = random.Random(1)
+    moves = dict(tuple_board.MOVES)
+    for _ in range(2000):
+        matrix = random_matrix(rng.randint(3, 6), rng)
+        board = tuple_board.from_matrix(matrix)
+        for direction in DIRECTIONS:
+            expected, done, score = getattr(logic, direction)([row[:] for row in matrix])
+            new_board, gained, valid = moves[direction](board)
+            assert new_board == tuple_board.from_matrix(expected), (matrix, direction)
+            assert gained == score, (matrix, direction)
+            assert valid == done, (matrix, direction)
+
+
+def test_is_move_valid_matches_moves():
+    """logic.is_move_valid agrees with the done flag of the moves."""
+    rng = random.Random(2)
+    for _ in range(2000):
+        matrix = random_matrix(rng.randint(3, 6), rng)
+        for direction in DIRECTIONS:
+            _, done, _ = getattr(logic, direction)([row[:] for row in matrix])
+            assert logic.is_move_valid(matrix, direction) == done, (matrix, direction)
+
+
+if __name__ == "__main__":
+    test_bitboard_moves_match_logic()
+    test_tuple_board_moves_match_logic()
+    test_is_move_valid_matches_moves()
+    print("ok")
@@ -0,0 +1,125 @@
+"""
+Checks for ExpectimaxAgent's search paths.
+
+Runs under pytest, or directly with `python -m agents.test_expectimax_agent`
+from the repository root.
+"""
+
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from agents import board as bitboard
+from agents import search_kernel
+from agents.expectimax import ExpectimaxAgent
+
+
+class MockGameGrid:
+    """Minimal stand-in for GameGrid: agents only read the matrix."""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+
+BOARD_4X4 = [
+    [2, 4, 8, 0],
+    [0, 2, 0, 0],
+    [4, 0, 0, 2],
+    [0, 0, 0, 0],
+]
+
+BOARD_5X5 = [
+    [2, 4, 0, 0, 0],
+    [0, 2, 0, 8, 0],
+    [0, 0, 4, 0, 0],
+    [16, 0, 0, 0, 2],
+    [0, 0, 0, 0, 0],
+]
+
+
+def test_workers_use_process_pool_on_5x5_board():
+    """The compiled kernel cannot search a 5x5 board, so workers must not be ignored."""
+    agent = ExpectimaxAgent(depth=2, verbose=False, workers=2)
+    try:
+        move = agent.next_move(MockGameGrid(BOARD_5X5))
+        assert move in ('up', 'down', 'left', 'right')
+        assert isinstance(agent._executor, ProcessPoolExecutor)
+    finally:
+        agent.close()
+
+
+def test_workers_search_4x4_root_moves_in_threads():
+    """With the compiled kernel, workers split the root moves across threads."""
+    if not search_kernel.KERNEL_AVAILABLE:
+        return
+    random.seed(0)
+    serial_move = ExpectimaxAgent(depth=2, verbose=False).next_move(MockGameGrid(BOARD_4X4))
+    agent = ExpectimaxAgent(depth=2, verbose=False, workers=2)
+    try:
+        random.seed(0)
+        assert agent.next_move(MockGameGrid(BOARD_4X4)) == serial_move
+        assert isinstance(agent._threads, ThreadPoolExecutor)
+    finally:
+        agent.close()
+
+
+def random_matrix(rng, empties):
+    """A random 4x4 matrix with `empties` empty cells and tiles up to 2048."""
+    cells = [rng.choice((2, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048))
+             for _ in range(16 - empties)] + [0] * empties
+    rng.shuffle(cells)
+    return [cells[4 * i:4 * i + 4] for i in range(4)]
+
+
+def test_evaluate_board_matches_evaluate_state():
+    """The row-table bitboard evaluation scores boards like the matrix heuristics."""
+    rng = random.Random(0)
+    agent = ExpectimaxAgent(verbose=False, use_jit=False)
+    agent.reset()
+    for _ in range(2000):
+        matrix = random_matrix(rng, rng.randint(0, 15))
+        expected = agent.evaluate_state(matrix)
+        score = agent.evaluate_board(bitboard.pack(matrix))
+        assert abs(score - expected) <= 1e-9 * max(1.0, abs(expected)), matrix
+
+
+def check_kernel_matches_python_search():
+    """The compiled search of the active backend gives the Python search's score and move."""
+    rng = random.Random(1)
+    agent = ExpectimaxAgent(depth=3, verbose=False, use_jit=False)
+    agent.reset()
+    tables = search_kernel.make_tables(agent._row_tables)
+    for _ in range(30):
+        # At depth 3 no chance node samples cells, so both searches are exact
+        board = bitboard.pack(random_matrix(rng, rng.randint(1, 6)))
+        agent.tt.clear()
+        agent.root_depth = 3
+        expected, expected_move = agent.expectimax_board(board, 3, is_max_node=True)
+        score, move = search_kernel.search(
+            board, 3, tables, search_kernel.new_tt(), search_kernel.new_stats(),
+            agent.weights, agent.cmin, False
+        )
+        assert move == expected_move, bitboard.unpack(board)
+        assert abs(score - expected) <= 1e-9 * max(1.0, abs(expected)), bitboard.unpack(board)
+
+
+def test_kernels_match_python_search():
+    """Both compiled backends (when installed) search like the Python bitboard search."""
+    if search_kernel.CYTHON_AVAILABLE:
+        check_kernel_matches_python_search()
+    if search_kernel.NUMBA_AVAILABLE:
+        # The helpers dispatch on CYTHON_AVAILABLE, so turning it off
+        # selects the Numba kernel
+        cython_available = search_kernel.CYTHON_AVAILABLE
+        search_kernel.CYTHON_AVAILABLE = False
+        try:
+            check_kernel_matches_python_search()
+        finally:
+            search_kernel.CYTHON_AVAILABLE = cython_available
+
+
+if __name__ == "__main__":
+    test_workers_use_process_pool_on_5x5_board()
+    test_workers_search_4x4_root_moves_in_threads()
+    test_evaluate_board_matches_evaluate_state()
+    test_kernels_match_python_search()
+    print("ok")
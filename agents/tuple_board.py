@@ -0,0 +1,80 @@
+"""
+Immutable tuple boards for grids of any size.
+
+A board is a tuple of row tuples. Unlike the list-of-lists game matrix it is
+hashable, so it can key caches and transposition tables, and moves return a
+new board instead of mutating their input, so no defensive copies are needed.
+Lines are slid with the game's own rule, game_files.logic.slide_line.
+"""
+
+from game_files.logic import slide_line
+
+
+def from_matrix(matrix):
+    """Convert a list-of-lists game matrix into a tuple board."""
+    return tuple(tuple(row) for row in matrix)
+
+
+def move_left(board):
+    """Slide the board left. Returns (new_board, score_gained, valid)."""
+    rows = []
+    score = 0
+    for row in board:
+        new_row, gained = slide_line(row)
+        rows.append(tuple(new_row))
+        score += gained
+    new_board = tuple(rows)
+    return new_board, score, new_board != board
+
+
+def move_right(board):
+    """Slide the board right. Returns (new_board, score_gained, valid)."""
+    rows = []
+    score = 0
+    for row in board:
+        new_row, gained = slide_line(row[::-1])
+        new_row.reverse()
+        rows.append(tuple(new_row))
+        score += gained
+    new_board = tuple(rows)
+    return new_board, score, new_board != board
+
+
+def move_up(board):
+    """Slide the board up. Returns (new_board, score_gained, valid)."""
+    cols = []
+    score = 0
+    for col in zip(*board):
+        new_col, gained = slide_line(col)
+        cols.append(new_col)
+        score += gained
+    new_board = tuple(zip(*cols))
+    return new_board, score, new_board != board
+
+
+def move_down(board):
+    """Slide the board down. Returns (new_board, score_gained, valid)."""
+    cols = []
+    score = 0
+    for col in zip(*board):
+        new_col, gained = slide_line(col[::-1])
+        new_col.reverse()
+        cols.append(new_col)
+        score += gained
+    new_board = tuple(zip(*cols))
+    return new_board, score, new_board != board
+
+
+# Same order the agents have always tried directions in
+MOVES = (
+    ('up', move_up),
+    ('down', move_down),
+    ('left', move_left),
+    ('right', move_right),
+)
+
+
+def place_tile(board, i, j, value):
+    """Return a copy of the board with value placed at (i, j)."""
+    row = board[i]
+    return board[:i] + (row[:j] + (value,) + row[j + 1:],) + board[i + 1:]
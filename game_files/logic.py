@@ -8,13 +8,6 @@
 
 import random
 
-# Handle imports for both direct execution and package import
-try:
-    from . import constants as c
-except ImportError:
-    # When running directly, use relative imports
-    import constants as c
-
 #######
 # Task 1a #
 #######
@@ -25,11 +18,11 @@ except ImportError:
 # 1 mark for creating the correct matrix
 
 def new_game(n):
-    matrix = []
-    for i in range(n):
-        matrix.append([0] * n)
-    matrix = add_two(matrix)
-    matrix = add_two(matrix)
+    matrix = [[0] * n for _ in range(n)]
+    # both starting 2s in one draw of two distinct cells, instead of two
+    # add_two calls searching the board for an empty cell
+    for cell in random.sample(range(n * n), 2):
+        matrix[cell // n][cell % n] = 2
     return matrix
 
 ###########
@@ -42,12 +35,12 @@ def new_game(n):
 # 1 mark for creating the correct loop
 
 def add_two(mat):
-    a = random.randint(0, len(mat)-1)
-    b = random.randint(0, len(mat)-1)
-    while mat[a][b] != 0:
-        a = random.randint(0, len(mat)-1)
-        b = random.randint(0, len(mat)-1)
-    mat[a][b] = 2
+    # pick uniformly among the empty cells instead of resampling random
+    # cells until an empty one comes up (slow on a nearly full board)
+    empty = [(i, j) for i, row in enumerate(mat) for j, value in enumerate(row) if value == 0]
+    if empty:
+        a, b = random.choice(empty)
+        mat[a][b] = 2
     return mat
 
 ###########
@@ -63,29 +56,22 @@ def add_two(mat):
 # 3 marks for correct checking
 
 def game_state(mat):
-    # check for win cell
-    for i in range(len(mat)):
-        for j in range(len(mat[0])):
-            if mat[i][j] == 2048:
-                return 'win'
+    # check for win cell (anywhere, so it comes before the other checks)
+    if any(2048 in row for row in mat):
+        return 'win'
     # check for any zero entries
-    for i in range(len(mat)):
-        for j in range(len(mat[0])):
-            if mat[i][j] == 0:
+    if any(0 in row for row in mat):
+        return 'not over'
+    # check for same cells that touch each other: left/right in every row,
+    # then up/down between every pair of neighbouring rows
+    for row in mat:
+        for a, b in zip(row, row[1:]):
+            if a == b:
                 return 'not over'
-    # check for same cells that touch each other
-    for i in range(len(mat)-1):
-        # intentionally reduced to check the row on the right and below
-        # more elegant to use exceptions but most likely this will be their solution
-        for j in range(len(mat[0])-1):
-            if mat[i][j] == mat[i+1][j] or mat[i][j+1] == mat[i][j]:
+    for upper, lower in zip(mat, mat[1:]):
+        for a, b in zip(upper, lower):
+            if a == b:
                 return 'not over'
-    for k in range(len(mat)-1):  # to check the left/right entries on the last row
-        if mat[len(mat)-1][k] == mat[len(mat)-1][k+1]:
-            return 'not over'
-    for j in range(len(mat)-1):  # check up/down entries on last column
-        if mat[j][len(mat)-1] == mat[j+1][len(mat)-1]:
-            return 'not over'
     return 'lose'
 
 ###########
@@ -99,12 +85,7 @@ def game_state(mat):
 # 2 marks for correct solutions that work for all sizes of matrices
 
 def reverse(mat):
-    new = []
-    for i in range(len(mat)):
-        new.append([])
-        for j in range(len(mat[0])):
-            new[i].append(mat[i][len(mat[0])-j-1])
-    return new
+    return [row[::-1] for row in mat]
 
 ###########
 # Task 2b #
@@ -117,12 +98,7 @@ def reverse(mat):
 # 2 marks for correct solutions that work for all sizes of matrices
 
 def transpose(mat):
-    new = []
-    for i in range(len(mat[0])):
-        new.append([])
-        for j in range(len(mat)):
-            new[i].append(mat[j][i])
-    return new
+    return [list(col) for col in zip(*mat)]
 
 ##########
 # Task 3 #
@@ -137,69 +113,113 @@ def transpose(mat):
 # 2 per up/down/left/right?) But if you get one correct likely to get all correct so...
 # Check the down one. Reverse/transpose if ordered wrongly will give you wrong result.
 
-def cover_up(mat):
+def slide_line(line, max_tile=None):
+    # compress -> merge -> compress for a single row or column, towards
+    # index 0; returns the new line as a list and the score gained. Tiles
+    # equal to max_tile never merge (the bitboard cannot hold their sum).
+    # This is the one slide rule shared by the game, agents.tuple_board and
+    # the agents.board move tables
+    tiles = list(filter(None, line))
     new = []
-    for j in range(c.GRID_LEN):
-        partial_new = []
-        for i in range(c.GRID_LEN):
-            partial_new.append(0)
-        new.append(partial_new)
-    done = False
-    for i in range(c.GRID_LEN):
-        count = 0
-        for j in range(c.GRID_LEN):
-            if mat[i][j] != 0:
-                new[i][count] = mat[i][j]
-                if j != count:
-                    done = True
-                count += 1
-    return new, done
-
-def merge(mat, done):
     score = 0
-    for i in range(c.GRID_LEN):
-        for j in range(c.GRID_LEN-1):
-            if mat[i][j] == mat[i][j+1] and mat[i][j] != 0:
-                mat[i][j] *= 2
-                mat[i][j+1] = 0
-                score += mat[i][j]
-                done = True
-    return mat, done, score
+    k = 0
+    while k < len(tiles):
+        value = tiles[k]
+        if k + 1 < len(tiles) and value == tiles[k+1] and value != max_tile:
+            new.append(value * 2)
+            score += value * 2
+            k += 2
+        else:
+            new.append(value)
+            k += 1
+    new += [0] * (len(line) - len(new))
+    return new, score
 
 def up(game):
    #print("up")
-    # return matrix after shifting up
-    game = transpose(game)
-    game, done = cover_up(game)
-    game, done, score = merge(game, done)
-    game = cover_up(game)[0]
-    game = transpose(game)
+    # return matrix after shifting up; each column is slid directly
+    # instead of transposing the whole matrix there and back
+    cols = []
+    done = False
+    score = 0
+    for col in zip(*game):
+        new, gained = slide_line(col)
+        if not done and new != list(col):
+            done = True
+        cols.append(new)
+        score += gained
+    game = [list(row) for row in zip(*cols)]
     return game, done, score
 
 def down(game):
    # print("down")
-    # return matrix after shifting down
-    game = reverse(transpose(game))
-    game, done = cover_up(game)
-    game, done, score = merge(game, done)
-    game = cover_up(game)[0]
-    game = transpose(reverse(game))
+    # return matrix after shifting down; each column is slid directly
+    cols = []
+    done = False
+    score = 0
+    for col in zip(*game):
+        new, gained = slide_line(col[::-1])
+        new.reverse()
+        if not done and new != list(col):
+            done = True
+        cols.append(new)
+        score += gained
+    game = [list(row) for row in zip(*cols)]
     return game, done, score
 
 def left(game):
    # print("left")
-    # return matrix after shifting left
-    game, done = cover_up(game)
-    game, done, score = merge(game, done)
-    game = cover_up(game)[0]
-    return game, done, score
+    # return matrix after shifting left; each row is slid in one pass
+    rows = []
+    done = False
+    score = 0
+    for row in game:
+        new, gained = slide_line(row)
+        if not done and new != row:
+            done = True
+        rows.append(new)
+        score += gained
+    return rows, done, score
 
 def right(game):
     #print("right")
-    # return matrix after shifting right
-    game = reverse(game)
-    game, done = cover_up(game)
-    game, done, score = merge(game, done)
-    game = cover_up(game)[0]
-    game = reverse(game)
-    return game, done, score
\ No newline at end of file
+    # return matrix after shifting right; each row is slid in one pass
+    rows = []
+    done = False
+    score = 0
+    for row in game:
+        new, gained = slide_line(row[::-1])
+        new.reverse()
+        if not done and new != row:
+            done = True
+        rows.append(new)
+        score += gained
+    return rows, done, score
+
+
+def _line_can_move(line):
+    # a line (first cell in the direction of the move) changes if some tile
+    # can slide into an empty cell or merge with its equal neighbour
+    for a, b in zip(line, line[1:]):
+        if b != 0 and (a == 0 or a == b):
+            return True
+    return False
+
+def is_move_valid(mat, direction):
+    # same answer as the `done` flag of up/down/left/right, without building
+    # the moved matrix
+    if direction == 'left':
+        lines = mat
+    elif direction == 'right':
+        lines = [row[::-1] for row in mat]
+    elif direction == 'up':
+        lines = list(zip(*mat))
+    elif direction == 'down':
+        lines = [col[::-1] for col in zip(*mat)]
+    else:
+        raise ValueError(f"Unknown direction: {direction}")
+    return any(map(_line_can_move, lines))
+
+def count_empties(mat):
+    # cheap ordering/evaluation key for searches; list.count runs in C
+    return sum(row.count(0) for row in mat)
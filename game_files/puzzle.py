@@ -48,6 +48,12 @@ class GameGrid(Frame):
         else:
             self.generation_method = generation_method
 
+        # Resolve the tile spawner once instead of checking on every move
+        if self.generation_method is not None:
+            self._add_tile = self.generation_method.add_tile
+        else:
+            self._add_tile = logic.add_two
+
         self.commands = {
             c.KEY_UP: logic.up,
             c.KEY_DOWN: logic.down,
@@ -176,11 +182,8 @@ class GameGrid(Frame):
         self.matrix, done, score = move_function(self.matrix)
         if done:
             self.score += score
-            # Use generation method if available, otherwise fallback to logic.add_two
-            if self.generation_method is not None:
-                self.matrix = self.generation_method.add_tile(self.matrix)
-            else:
-                self.matrix = logic.add_two(self.matrix)
+            # Generation method if available, otherwise logic.add_two
+            self.matrix = self._add_tile(self.matrix)
             # record last move
             self.history_matrixs.append(self.matrix)
             self.update_grid_cells()
@@ -3,17 +3,38 @@ Base generation method class for 2048 tile generation.
 All generation methods should inherit from this class and implement the add_tile method.
 """
 
+import random
+
 
 class GenerationMethod:
     """
     Base class for all 2048 tile generation methods.
     
     Generation methods can maintain state between tile additions using instance variables.
+    Subclasses draw their random numbers from self.rng.
     """
     
-    def __init__(self):
-        """Initialize the generation method. Override to set up any needed state."""
-        pass
+    # Generator tiles are drawn from; seed() gives an instance its own
+    rng = random
+    
+    def __init__(self, seed=None):
+        """
+        Initialize the generation method. Override to set up any needed state.
+        
+        Args:
+            seed: If given, the method is seeded with it (see seed()). If None,
+                  the shared random module is used and random.seed() controls
+                  tile placement.
+        """
+        if seed is not None:
+            self.seed(seed)
+    
+    def seed(self, seed):
+        """
+        Draw tiles from a private random.Random(seed) from now on, so the
+        spawns do not depend on (or disturb) any other use of the random module.
+        """
+        self.rng = random.Random(seed)
     
     def add_tile(self, matrix):
         """
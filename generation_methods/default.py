@@ -3,7 +3,6 @@ Default generation method implementation for the 2048 game.
 This mimics the standard 2048 behavior - randomly places a "2" (90% chance) or "4" (10% chance) in an empty cell.
 """
 
-import random
 from generation_methods.base import GenerationMethod
 
 
@@ -33,9 +32,10 @@ class Default(GenerationMethod):
         
         # If there are empty cells, randomly select one and place a tile
         if empty_cells:
-            i, j = random.choice(empty_cells)
+            rng = self.rng
+            i, j = rng.choice(empty_cells)
             # 90% chance for "2", 10% chance for "4"
-            tile_value = 2 if random.random() < 0.9 else 4
+            tile_value = 2 if rng.random() < 0.9 else 4
             matrix[i][j] = tile_value
         
         return matrix
@@ -3,7 +3,6 @@ Random generation method implementation for the 2048 game.
 This mimics the original add_two behavior - randomly places a "2" in an empty cell.
 """
 
-import random
 from generation_methods.base import GenerationMethod
 
 
@@ -32,7 +31,8 @@ class Random2(GenerationMethod):
         
         # If there are empty cells, randomly select one and place a "2"
         if empty_cells:
-            i, j = random.choice(empty_cells)
+            rng = self.rng
+            i, j = rng.choice(empty_cells)
             matrix[i][j] = 2
         
         return matrix
@@ -3,10 +3,22 @@ Scaling generation method implementation for the 2048 game.
 This method generates tiles based on the current maximum value on the board.
 """
 
-import random
+from functools import lru_cache
 from generation_methods.base import GenerationMethod
 
 
+@lru_cache(maxsize=None)
+def _possible_values(max_value):
+    """All powers of 2 from 2 up to max_value, as a tuple."""
+    # Start from 2 and go up to max_value
+    possible_values = []
+    power = 2
+    while power <= max_value:
+        possible_values.append(power)
+        power *= 2
+    return tuple(possible_values)
+
+
 class Scaling(GenerationMethod):
     """
     Scaling generation method that places a tile with value equal to any power of 2
@@ -24,41 +36,34 @@ class Scaling(GenerationMethod):
         Returns:
             The modified matrix with a new tile added
         """
-        # Find all empty cells
+        # Find all empty cells and the maximum value on the board in one pass
         empty_cells = []
-        for i in range(len(matrix)):
-            for j in range(len(matrix[0])):
-                if matrix[i][j] == 0:
+        max_value = 0
+        for i, row in enumerate(matrix):
+            for j, value in enumerate(row):
+                if value == 0:
                     empty_cells.append((i, j))
-        
+                elif value > max_value:
+                    max_value = value
+
         # If there are no empty cells, return matrix unchanged
         if not empty_cells:
             return matrix
-        
-        # Find the maximum value on the board
-        max_value = 0
-        for i in range(len(matrix)):
-            for j in range(len(matrix[0])):
-                if matrix[i][j] > max_value:
-                    max_value = matrix[i][j]
-        
+
         # If board is empty (max_value is 0), default to generating 2
         if max_value == 0:
             max_value = 2
         
-        # Find all powers of 2 less than or equal to max_value
-        # Start from 2 and go up to max_value
-        possible_values = []
-        power = 2
-        while power <= max_value:
-            possible_values.append(power)
-            power *= 2
+        # Find all powers of 2 less than or equal to max_value; the max tile
+        # changes rarely, so the list is cached per max_value
+        possible_values = _possible_values(max_value)
         
         # Randomly select one of the possible values
-        tile_value = random.choice(possible_values)
+        rng = self.rng
+        tile_value = rng.choice(possible_values)
         
         # Place the tile in a random empty cell
-        i, j = random.choice(empty_cells)
+        i, j = rng.choice(empty_cells)
         matrix[i][j] = tile_value
         
         return matrix
@@ -0,0 +1,60 @@
+"""
+Checks for seeded generation methods.
+
+Runs under pytest, or directly with `python -m generation_methods.test_generation_methods`
+from the repository root.
+"""
+
+import pickle
+import random
+
+from generation_methods import Default, Random2, Scaling
+
+
+def spawn_sequence(method, draws=50):
+    """Cells and values of `draws` spawns on boards that fill up and are cleared."""
+    spawns = []
+    matrix = [[0] * 4 for _ in range(4)]
+    for k in range(draws):
+        if k % 16 == 0:
+            matrix = [[0] * 4 for _ in range(4)]
+            matrix[3][3] = 64  # so Scaling has several values to choose from
+        before = [row[:] for row in matrix]
+        method.add_tile(matrix)
+        spawns.append([(i, j, matrix[i][j]) for i in range(4) for j in range(4)
+                       if matrix[i][j] != before[i][j]])
+    return spawns
+
+
+def test_seeded_spawns_ignore_the_random_module():
+    """A seeded method spawns the same tiles whatever else draws from random."""
+    for method_class in (Default, Random2, Scaling):
+        random.seed(0)
+        expected = spawn_sequence(method_class(seed=7))
+        random.seed(1)
+        random.random()
+        assert spawn_sequence(method_class(seed=7)) == expected, method_class.__name__
+        assert spawn_sequence(method_class(seed=8)) != expected, method_class.__name__
+
+
+def test_seed_survives_pickling():
+    """Experiment workers receive seeded methods pickled, mid-sequence included."""
+    method = Default(seed=3)
+    spawn_sequence(method, draws=5)
+    copy = pickle.loads(pickle.dumps(method))
+    assert spawn_sequence(copy) == spawn_sequence(method)
+
+
+def test_unseeded_methods_use_the_random_module():
+    """Without a seed, random.seed() controls the spawns as before."""
+    random.seed(5)
+    expected = spawn_sequence(Default())
+    random.seed(5)
+    assert spawn_sequence(Default()) == expected
+
+
+if __name__ == "__main__":
+    test_seeded_spawns_ignore_the_random_module()
+    test_seed_survives_pickling()
+    test_unseeded_methods_use_the_random_module()
+    print("ok")
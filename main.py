@@ -8,11 +8,15 @@ Can run in interactive mode (user input) or with an agent method.
 
 import sys
 import time
+import queue
+import threading
+from types import SimpleNamespace
 from tkinter import Tk
 from game_files.puzzle import GameGrid
 import game_files.logic as logic
 from agents.naive import RandomAgent
-from monte_carlo.improved_mcts import ImprovedMCTSAgent, RandomPlayoutAgent
+from monte_carlo.improved_mcts import (ImprovedMCTSAgent, ParallelPlayoutAgent, ParallelRootMCTSAgent,
+                                       RandomPlayoutAgent)
 from generation_methods import Random2, Default, Scaling
 from agents.expectimax import ExpectimaxAgent, ExpectimaxAgentFast, ExpectimaxAgentDeep
 
@@ -23,7 +27,9 @@ AGENT_CLASSES = {
     
     # Monte Carlo Tree Search agents
     'mcts': ImprovedMCTSAgent,
+    'mcts_parallel': ParallelRootMCTSAgent,  # One tree per CPU, merged at the root
     'mcts_playout': RandomPlayoutAgent,
+    'mcts_playout_parallel': ParallelPlayoutAgent,  # Playouts split across CPUs
 
     # Expectimax agents
     'expectimax': ExpectimaxAgent,           # Standard (depth=3)
@@ -43,42 +49,81 @@ def run_with_agent(game_grid, agent):
     """
     Run the game with an agent that decides moves.
     
+    The agent decides in a background thread, so a slow search does not
+    freeze the window. Widgets and the board may only be touched from the
+    Tk thread, so it hands the agent a copy of the board, polls for the
+    decision every millisecond and applies it. A decision is dropped if the
+    board changed in the meantime (e.g. from a key press), and the agent is
+    asked again with the current board. The agent is closed when the
+    window is.
+    
     Args:
         game_grid: The GameGrid instance
         agent: An Agent instance with a next_move method
     """
-    def make_agent_move():
-        """Make one move using the agent, then schedule the next one."""
-        # Check game state
-        state = logic.game_state(game_grid.matrix)
-        if state == 'win':
-            print("Game won!")
-            return
-        elif state == 'lose':
-            print("Game lost!")
-            return
-        
-        # Get move from agent
-        direction = agent.next_move(game_grid)
-        
-        if direction is None:
-            print("No valid moves available!")
-            return
-        
-        # Execute the move
-        success = game_grid.make_move(direction)
+    boards = queue.Queue()
+    decisions = queue.Queue()
+    
+    def send_board():
+        """Hand the agent a snapshot of the current board."""
+        boards.put([row[:] for row in game_grid.matrix])
+    
+    def agent_loop():
+        """Decide moves until the game ends (runs off the Tk thread)."""
+        while True:
+            matrix = boards.get()
+            
+            # Check game state
+            state = logic.game_state(matrix)
+            if state == 'win':
+                print("Game won!")
+                return
+            elif state == 'lose':
+                print("Game lost!")
+                return
+            
+            # Get move from agent
+            direction = agent.next_move(SimpleNamespace(matrix=matrix))
+            
+            if direction is None:
+                print("No valid moves available!")
+                return
+            
+            # Hand the move to the Tk thread, with the board it was decided on
+            decisions.put((matrix, direction))
+    
+    def apply_agent_moves():
+        """Apply the agent's decision, if any, then poll again."""
+        try:
+            matrix, direction = decisions.get_nowait()
+        except queue.Empty:
+            direction = None
         
-        if not success:
-            print(f"Move {direction} was invalid, trying again...")
+        if direction is not None:
+            if matrix == game_grid.matrix:
+                # Execute the move
+                success = game_grid.make_move(direction)
+                
+                if not success:
+                    print(f"Move {direction} was invalid, trying again...")
+            send_board()
         
-        # Schedule next move
-        game_grid.master.after(100, make_agent_move)
+        # Keep polling while the agent is still playing
+        if worker.is_alive() or not decisions.empty():
+            game_grid.master.after(1, apply_agent_moves)
     
-    # Start the agent loop
-    game_grid.master.after(100, make_agent_move)
+    # Start the agent loop; daemon so closing the window ends the program
+    worker = threading.Thread(target=agent_loop, daemon=True)
+    send_board()
+    worker.start()
+    game_grid.master.after(1, apply_agent_moves)
     
-    # Start the mainloop
-    game_grid.mainloop()
+    # Start the mainloop; once the window is closed, shut down any worker
+    # pools the agent started
+    try:
+        game_grid.mainloop()
+    finally:
+        agent.close()
 
 
 def main():
@@ -7,8 +7,9 @@ below.
 """
 
 import math
+import os
 import random
-from agents.base import Agent
+from agents.base import Agent, worker_pool
 from game_files import logic
 
 DEFAULT_NUM_SIMULATIONS = 40  # Simulations per move
@@ -18,14 +19,24 @@ DEFAULT_ROLLOUT_EPSILON = 0.15 # Epsilon for rollout policy
 MOVE_FUNCS = {d: getattr(logic, d) for d in ['up', 'down', 'left', 'right']}
 
 
-def add_random_tile(state):
-    """Add a random tile (2 or 4) to an empty cell."""
+def spawn_tile(state):
+    """Put a random tile (2 or 4) on an empty cell of `state` in place.
+
+    Returns the (i, j) cell used, or None if the board is full.
+    """
     empty = [(i, j) for i, row in enumerate(state) for j, v in enumerate(row) if v == 0]
     if not empty:
-        return state
+        return None
     i, j = random.choice(empty)
+    state[i][j] = 2 if random.random() < 0.9 else 4
+    return i, j
+
+
+def add_random_tile(state):
+    """Add a random tile (2 or 4) to an empty cell."""
     new = [row[:] for row in state]
-    new[i][j] = 2 if random.random() < 0.9 else 4
+    if spawn_tile(new) is None:
+        return state
     return new
 
 
@@ -46,25 +57,42 @@ def all_spawn_children(state):
 
 
 def apply_move(state, direction):
-    """Apply a move to the board. Returns (new_state, moved, score)."""
-    board = [row[:] for row in state]
-    res = MOVE_FUNCS[direction](board)
-    if isinstance(res, tuple) and len(res) == 3:
-        a, b, c = res
-        if isinstance(a, list):
-            return a, bool(b), c
-        elif isinstance(b, list):
-            return b, bool(a), c
-    raise RuntimeError(f"Unexpected result from move function: {res}")
+    """Apply a move to the board. Returns (new_state, moved, score).
+
+    logic's move functions build a new matrix and leave `state` untouched,
+    so no defensive copy is needed; `moved` is their `done` flag.
+    """
+    new_state, moved, score = MOVE_FUNCS[direction](state)
+    return new_state, bool(moved), score
 
 
 def heuristic(state):
     """Heuristic: empty cells * 100 + log2(max_tile) * 20."""
-    empty = sum(v == 0 for row in state for v in row)
-    max_tile = max(v for row in state for v in row)
+    empty = logic.count_empties(state)
+    max_tile = max(map(max, state))
     return empty * 100.0 + math.log(max_tile + 1, 2) * 20.0
 
 
+def best_direction(stats):
+    """Pick the root move with the best average value.
+
+    `stats` maps directions to (visits, total_value), as returned by
+    ImprovedMCTSAgent.next_move_with_stats. Returns None if it is empty or
+    no move was visited.
+    """
+    best_dir = None
+    best_avg = -float('inf')
+    for direction, (visits, value) in stats.items():
+        if visits == 0:
+            avg = -float('inf')
+        else:
+            avg = value / visits
+        if avg > best_avg:
+            best_avg = avg
+            best_dir = direction
+    return best_dir
+
+
 class MCTSNode:
     """Node for MCTS tree (player/chance)."""
     __slots__ = ('state', 'parent', 'children', 'visits', 'value', 'node_type', 'prob')
@@ -101,16 +129,30 @@ class ImprovedMCTSAgent(Agent):
         self.rollout_epsilon = rollout_epsilon
         self.root = None
 
+    def reset(self):
+        """Drop the last move's search tree between games."""
+        self.root = None
+
     def next_move(self, game_grid):
         """Return best move using MCTS simulations."""
-        root_state = [row[:] for row in game_grid.matrix]
+        return best_direction(self.next_move_with_stats(game_grid.matrix))
+
+    def next_move_with_stats(self, matrix, num_simulations=None):
+        """Search `matrix` and return the root statistics.
+
+        Returns a dict mapping each valid direction to (visits, total_value)
+        of its root child, in expansion order; empty if the game is over.
+        """
+        if num_simulations is None:
+            num_simulations = self.num_simulations
+        root_state = [row[:] for row in matrix]
         self.root = MCTSNode(root_state, parent=None, node_type='player')
         
         # Quick check: if terminal, no move
         if self.root.is_terminal():
-            return None
+            return {}
 
-        for _ in range(self.num_simulations):
+        for _ in range(num_simulations):
             node, path = self._select(self.root)
             
             if not node.is_terminal():
@@ -142,22 +184,8 @@ class ImprovedMCTSAgent(Agent):
             # Backpropagate reward
             self._backpropagate(node, reward)
 
-        # After simulations, choose best root child by average value
-        if not self.root.children:
-            return None
-
-        best_dir = None
-        best_avg = -float('inf')
-        for direction, chance_node in self.root.children.items():
-            if chance_node.visits == 0:
-                avg = -float('inf')
-            else:
-                avg = chance_node.value / chance_node.visits
-            if avg > best_avg:
-                best_avg = avg
-                best_dir = direction
-
-        return best_dir
+        return {direction: (chance_node.visits, chance_node.value)
+                for direction, chance_node in self.root.children.items()}
 
     def _select(self, root):
         """Descend tree using UCB1 until expansion/simulation needed."""
@@ -263,8 +291,12 @@ class ImprovedMCTSAgent(Agent):
                     newb, moved, gained = apply_move(current, d)
                     if not moved:
                         continue
-                    # Lookahead one spawn
-                    val = heuristic(add_random_tile(newb)) + gained
+                    # Lookahead one spawn; newb is a fresh board, so the
+                    # tile is placed on it and taken off again
+                    cell = spawn_tile(newb)
+                    val = heuristic(newb) + gained
+                    if cell is not None:
+                        newb[cell[0]][cell[1]] = 0
                     if val > best_val:
                         best_val = val
                         best_state = newb
@@ -275,8 +307,11 @@ class ImprovedMCTSAgent(Agent):
                 new_state, gained = best_state, best_gain
 
             total_score += gained
-            # After player move, simulate random spawn
-            current = add_random_tile(new_state)
+            # After player move, simulate random spawn; rollout boards are
+            # built by the move functions, so they are not shared and the
+            # tile can be placed without copying
+            spawn_tile(new_state)
+            current = new_state
 
         # Add heuristic value of final board
         total_score += heuristic(current)
@@ -318,10 +353,8 @@ class RandomPlayoutAgent(Agent):
                 continue
             
             # Run playouts from this move
-            total = 0.0
             start_state = add_random_tile(newb)
-            for _ in range(self.num_simulations):
-                total += self.mcts._simulate(start_state)
+            total = self._playout_total(start_state)
             
             avg = gained + total / max(1, self.num_simulations)
             results[d] = avg
@@ -330,3 +363,150 @@ class RandomPlayoutAgent(Agent):
             return None
         
         return max(results.keys(), key=lambda k: results[k])
+
+    def _playout_total(self, start_state):
+        """Sum of num_simulations playout rewards from start_state."""
+        total = 0.0
+        for _ in range(self.num_simulations):
+            total += self.mcts._simulate(start_state)
+        return total
+
+
+def _run_playouts(start_state, seed, num_playouts):
+    """Run a share of one move's playouts in a worker process.
+
+    Uses the same rollout settings as RandomPlayoutAgent. Returns the sum
+    of the playout rewards.
+    """
+    random.seed(seed)
+    simulator = ImprovedMCTSAgent(num_simulations=0)
+    total = 0.0
+    for _ in range(num_playouts):
+        total += simulator._simulate(start_state)
+    return total
+
+
+class ParallelPlayoutAgent(RandomPlayoutAgent):
+    """RandomPlayoutAgent with each move's playouts split across worker processes."""
+
+    def __init__(self, workers=None, num_simulations=400, rollout_depth=60, rollout_epsilon=0.2):
+        """Initialize with playout parameters.
+
+        The playouts of every candidate move are shared between `workers`
+        processes (default: one per CPU); with one worker they run in this
+        process.
+        """
+        super().__init__(num_simulations=num_simulations, rollout_depth=rollout_depth,
+                         rollout_epsilon=rollout_epsilon)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        # Worker pool, started on first use and reused for every move
+        self._executor = None
+
+    def _playout_total(self, start_state):
+        """Sum of num_simulations playout rewards, computed by the workers."""
+        if self.workers <= 1:
+            return super()._playout_total(start_state)
+        if self._executor is None:
+            self._executor = worker_pool(self.workers)
+
+        # Independent playouts, so any split adds up to the same budget;
+        # each share gets its own seed so workers do not repeat each other
+        share, extra = divmod(self.num_simulations, self.workers)
+        futures = []
+        for k in range(self.workers):
+            num_playouts = share + (1 if k < extra else 0)
+            if num_playouts:
+                futures.append(self._executor.submit(
+                    _run_playouts, start_state, random.getrandbits(64), num_playouts))
+        return sum(future.result() for future in futures)
+
+    def close(self):
+        """Shut down the worker pool, if one was started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __getstate__(self):
+        # The worker pool cannot be pickled; a copy starts its own
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+
+def _search_tree(matrix, seed, num_simulations, exploration_constant, rollout_depth,
+                 rollout_epsilon):
+    """Grow one independent MCTS tree in a worker process.
+
+    Module-level so it can be sent to a worker. The seed is drawn by the
+    parent for every tree, so trees differ even when workers are forked
+    with the same random state.
+
+    Returns the root statistics from ImprovedMCTSAgent.next_move_with_stats.
+    """
+    random.seed(seed)
+    agent = ImprovedMCTSAgent(num_simulations=num_simulations,
+                              exploration_constant=exploration_constant,
+                              rollout_depth=rollout_depth, rollout_epsilon=rollout_epsilon)
+    return agent.next_move_with_stats(matrix)
+
+
+class ParallelRootMCTSAgent(Agent):
+    """Root-parallel MCTS: independent trees in worker processes, merged at the root."""
+
+    def __init__(self, num_trees=None, num_simulations=DEFAULT_NUM_SIMULATIONS,
+                 exploration_constant=1.4, rollout_depth=DEFAULT_ROLLOUT_DEPTH,
+                 rollout_epsilon=DEFAULT_ROLLOUT_EPSILON):
+        """Initialize the agent.
+
+        num_trees trees (default: one per CPU) share the num_simulations
+        budget of a move. Their root visits and values are summed and the
+        move with the best pooled average is played, as ImprovedMCTSAgent
+        does for a single tree. With one tree the search runs in this
+        process.
+        """
+        super().__init__()
+        if num_trees is None:
+            num_trees = os.cpu_count() or 1
+        self.num_trees = num_trees
+        self.num_simulations = num_simulations
+        self.c = exploration_constant
+        self.rollout_depth = rollout_depth
+        self.rollout_epsilon = rollout_epsilon
+        # Worker pool, started on first use and reused for every move
+        self._executor = None
+
+    def next_move(self, game_grid):
+        """Return the best move over all trees."""
+        budget = max(1, self.num_simulations // self.num_trees)
+        args = (budget, self.c, self.rollout_depth, self.rollout_epsilon)
+        seeds = [random.getrandbits(64) for _ in range(self.num_trees)]
+
+        if self.num_trees <= 1:
+            results = [_search_tree(game_grid.matrix, seeds[0], *args)]
+        else:
+            if self._executor is None:
+                self._executor = worker_pool(self.num_trees)
+            futures = [self._executor.submit(_search_tree, game_grid.matrix, seed, *args)
+                       for seed in seeds]
+            results = [future.result() for future in futures]
+
+        merged = {}
+        for stats in results:
+            for direction, (visits, value) in stats.items():
+                total_visits, total_value = merged.get(direction, (0, 0.0))
+                merged[direction] = (total_visits + visits, total_value + value)
+        return best_direction(merged)
+
+    def close(self):
+        """Shut down the worker pool, if one was started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __getstate__(self):
+        # The worker pool cannot be pickled; a copy starts its own
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
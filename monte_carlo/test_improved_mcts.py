@@ -74,7 +74,7 @@ def run_mcts_game(num_simulations=200, rollout_depth=40, rollout_epsilon=0.15):
         
         # Update title
         elapsed = time.time() - state['start_time']
-        max_tile = max(max(row) for row in game_grid.matrix)
+        max_tile = max(map(max, game_grid.matrix))
         root.title(f"2048 - ImprovedMCTS | Moves: {state['moves']} | Score: {game_grid.score} | Max: {max_tile} | {elapsed:.0f}s")
         
         # Schedule next move
@@ -90,7 +90,7 @@ def run_mcts_game(num_simulations=200, rollout_depth=40, rollout_epsilon=0.15):
     root.mainloop()
     
     elapsed = time.time() - state['start_time']
-    max_tile = max(max(row) for row in game_grid.matrix)
+    max_tile = max(map(max, game_grid.matrix))
     
     print(f"\n{'='*50}")
     print(f"GAME RESULTS")
@@ -19,11 +19,11 @@ import constants as c
 # 1 mark for creating the correct matrix
 
 def new_game(n):
-    matrix = []
-    for i in range(n):
-        matrix.append([0] * n)
-    matrix = add_two(matrix)
-    matrix = add_two(matrix)
+    matrix = [[0] * n for _ in range(n)]
+    # both starting 2s in one draw of two distinct cells, instead of two
+    # add_two calls searching the board for an empty cell
+    for cell in random.sample(range(n * n), 2):
+        matrix[cell // n][cell % n] = 2
     return matrix
 
 ###########
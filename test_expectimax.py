@@ -7,15 +7,47 @@ Tests Expectimax under:
 3. Evaluates heuristic reliability across conditions
 """
 
+import io
+import os
 import sys
 import time
 import copy
+import random
+import multiprocessing
+from collections import Counter
 from game_files import logic
 from game_files import constants as c
 from agents.expectimax import ExpectimaxAgent
 from agents.naive import RandomAgent
 from generation_methods import Default, Scaling
 
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+
+# Move functions by direction, shared by every mock grid
+DIRECTION_MAP = {
+    'up': logic.up,
+    'down': logic.down,
+    'left': logic.left,
+    'right': logic.right
+}
+
+# One bit per direction, for tracking moves that left the board unchanged
+DIRECTION_BITS = {'up': 1, 'down': 2, 'left': 4, 'right': 8}
+ALL_DIRECTIONS_TRIED = 0b1111
+
+
+class MockGameGrid:
+    """Minimal stand-in for GameGrid: the matrix and direction map agents read."""
+    
+    direction_map = DIRECTION_MAP
+    
+    def __init__(self, matrix):
+        self.matrix = matrix
+
 
 def run_single_game(agent, grid_size=4, generation_method=None, max_moves=10000, verbose=False):
     """
@@ -45,50 +77,60 @@ def run_single_game(agent, grid_size=4, generation_method=None, max_moves=10000,
         if generation_method is None:
             generation_method = Default()
         
-        # Create a mock game_grid object
-        class MockGameGrid:
-            def __init__(self, matrix):
-                self.matrix = matrix
-                self.direction_map = {
-                    'up': logic.up,
-                    'down': logic.down,
-                    'left': logic.left,
-                    'right': logic.right
-                }
-        
         game_grid = MockGameGrid(matrix)
         
+        # Local names for everything called once per move
+        game_state = logic.game_state
+        next_move = agent.next_move
+        add_tile = generation_method.add_tile
+        direction_map = DIRECTION_MAP
+        
+        # Directions found invalid on the current board; the game is over
+        # once all four have failed. Stochastic agents may re-propose a
+        # failed direction before finding a valid one, so repeats are allowed
+        tried_invalid = 0
+        
         # Play until game over
+        state = game_state(matrix)
         while moves < max_moves:
-            state = logic.game_state(matrix)
-            if state in ['win', 'lose']:
+            if state == 'win' or state == 'lose':
                 break
             
             # Get agent's move
             game_grid.matrix = matrix
-            direction = agent.next_move(game_grid)
+            direction = next_move(game_grid)
             
             if direction is None:
                 break
             
             # Execute move
-            move_func = game_grid.direction_map[direction]
-            new_matrix, done, score = move_func(matrix)
+            new_matrix, done, score = direction_map[direction](matrix)
             
             if not done:
+                # Stuck once every direction has failed on this board
+                tried_invalid |= DIRECTION_BITS[direction]
+                if tried_invalid == ALL_DIRECTIONS_TRIED:
+                    break
                 continue
             
             # Update state - use generation method
-            matrix = generation_method.add_tile(new_matrix)
+            matrix = add_tile(new_matrix)
             total_score += score
             moves += 1
+            tried_invalid = 0
+            
+            # Only a full board can be lost, and a 2048 tile can only come
+            # from a merge worth at least 2048 points (spawns never exceed
+            # the largest tile), so game_state is skipped on other moves
+            if score >= 2048 or all(map(all, matrix)):
+                state = game_state(matrix)
             
             if verbose and moves % 100 == 0:
-                max_tile = max(max(row) for row in matrix)
+                max_tile = max(map(max, matrix))
                 print(f"  Move {moves}: Score={total_score}, Max tile={max_tile}")
         
         # Get final statistics
-        max_tile = max(max(row) for row in matrix)
+        max_tile = max(map(max, matrix))
         final_state = logic.game_state(matrix)
         
         return {
@@ -104,10 +146,70 @@ def run_single_game(agent, grid_size=4, generation_method=None, max_moves=10000,
         c.GRID_LEN = original_grid_len
 
 
-def run_experiment(agent_class, grid_size, generation_method, num_games=10, agent_name=None):
+def make_agent(agent_class, tile_dist):
+    """Create the agent for an experiment, matching its tile distribution."""
+    if issubclass(agent_class, ExpectimaxAgent):
+        return ExpectimaxAgent(depth=3, verbose=False, tile_distribution=tile_dist)
+    return agent_class()
+
+
+def play_seeded_game(agent, grid_size, generation_method, seed):
+    """
+    Play one game with a fixed random seed.
+    
+    The agent is reset first, so each game depends only on its arguments:
+    results do not depend on which process plays it or on the games the
+    agent played before.
+    
+    Returns:
+        dict with game statistics (see run_single_game), plus the seed
+    """
+    random.seed(seed)
+    agent.reset()
+    
+    # Tiles are spawned from the game's own generator, so the agent's use
+    # of the random module (cell sampling, rollouts) does not shift them
+    generation_method = copy.copy(generation_method)
+    generation_method.seed(seed)
+    
+    result = run_single_game(agent, grid_size=grid_size, generation_method=generation_method)
+    result['seed'] = seed
+    return result
+
+
+# Agent shared by all games played in a worker process
+_worker_agent = None
+
+
+def _init_worker(agent):
+    """Pool initializer: keep the worker's copy of the agent."""
+    global _worker_agent
+    _worker_agent = agent
+
+
+# Per-game fields sent back from workers; grid size and generation method
+# are the same for the whole experiment, so the parent fills them in
+_RESULT_FIELDS = ('seed', 'score', 'max_tile', 'moves', 'won')
+
+
+def _play_seeded_game(args):
+    """Pool.imap_unordered adapter for play_seeded_game, returning a _RESULT_FIELDS tuple."""
+    result = play_seeded_game(_worker_agent, *args)
+    return tuple(result[field] for field in _RESULT_FIELDS)
+
+
+def run_experiment(agent_class, grid_size, generation_method, num_games=10, agent_name=None,
+                   processes=None):
     """
     Run an experiment with specific configuration.
+    
+    Games are independent (game i is seeded with i), so they are played in
+    a pool of `processes` workers (default: one per CPU). With a single
+    process the games are played in this process. Progress is shown with
+    tqdm when it is installed.
     """
+    if processes is None:
+        processes = os.cpu_count() or 1
     if agent_name is None:
         agent_name = agent_class.__name__
     
@@ -125,61 +227,112 @@ def run_experiment(agent_class, grid_size, generation_method, num_games=10, agen
     print(f"Experiment: {agent_name} | Grid: {grid_size}x{grid_size} | Tiles: {method_name}")
     print(f"{'='*70}")
     
-    results = []
+    # Per-game results and the columns the statistics use, indexed by seed
+    # so games land in seed order whatever order they finish in
+    results = [None] * num_games
+    scores = [0] * num_games
+    max_tiles = [0] * num_games
+    moves = [0] * num_games
+    wins = 0
     start_time = time.time()
     
-    for i in range(num_games):
-        print(f"Game {i+1}/{num_games}...", end=' ', flush=True)
-        
-        # Create agent with matching tile distribution
-        if hasattr(agent_class, '__name__') and 'Expectimax' in str(agent_class):
-            agent = ExpectimaxAgent(depth=3, verbose=False, tile_distribution=tile_dist)
+    # The agent is created once and reset between games. Resetting it here
+    # loads its tables, so forked workers inherit them instead of each
+    # building their own
+    agent = make_agent(agent_class, tile_dist)
+    agent.reset()
+    
+    tasks = [(grid_size, generation_method, i) for i in range(num_games)]
+    if processes > 1 and num_games > 1:
+        # Game lengths vary a lot, so keep about four chunks per worker for
+        # load balancing; larger runs still save on round trips
+        processes = min(processes, num_games)
+        chunksize = max(1, num_games // (4 * processes))
+        # Forked workers share the parent's imported modules and tables
+        # copy-on-write. Fork is only safe on Linux (macOS system frameworks
+        # break in forked children); elsewhere the platform default pickles
+        # the agent to each worker
+        if sys.platform.startswith('linux'):
+            context = multiprocessing.get_context('fork')
         else:
-            agent = agent_class()
-        
-        result = run_single_game(agent, grid_size=grid_size, generation_method=generation_method)
-        results.append(result)
-        
-        print(f"Score: {result['score']:5d}, Max tile: {result['max_tile']:4d}, Moves: {result['moves']:3d}")
+            context = multiprocessing.get_context()
+        pool = context.Pool(processes, initializer=_init_worker, initargs=(agent,))
+        rows = pool.imap_unordered(_play_seeded_game, tasks, chunksize=chunksize)
+        games = (dict(zip(_RESULT_FIELDS, row), grid_size=grid_size, generation_method=method_name)
+                 for row in rows)
+    else:
+        pool = None
+        games = (play_seeded_game(agent, *task) for task in tasks)
     
-    elapsed_time = time.time() - start_time
+    # Per-game lines go through tqdm.write so they do not break the bar
+    write = print
+    if tqdm is not None:
+        games = tqdm(games, total=num_games, unit='game', leave=False)
+        write = tqdm.write
     
-    # Calculate statistics
-    scores = [r['score'] for r in results]
-    max_tiles = [r['max_tile'] for r in results]
-    moves = [r['moves'] for r in results]
-    wins = sum(1 for r in results if r['won'])
+    try:
+        for finished, result in enumerate(games, 1):
+            seed = result['seed']
+            results[seed] = result
+            scores[seed] = result['score']
+            max_tiles[seed] = result['max_tile']
+            moves[seed] = result['moves']
+            wins += result['won']
+            write(f"Game {finished}/{num_games} (seed {seed}): "
+                  f"Score: {result['score']:5d}, Max tile: {result['max_tile']:4d}, Moves: {result['moves']:3d}")
+    except BaseException:
+        # Cancelled (or a game failed): drop the queued games instead of
+        # waiting for all of them to be played
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        raise
     
-    # Tile achievements
+    if pool is not None:
+        pool.close()
+        pool.join()
+    
+    elapsed_time = time.time() - start_time
+    
+    # Tile achievements; max tiles take only a few distinct values, so
+    # they are counted once and the thresholds sum over those counts
     tile_thresholds = [128, 256, 512, 1024, 2048, 4096]
-    tile_counts = {t: sum(1 for tile in max_tiles if tile >= t) for t in tile_thresholds}
-    
-    # Print summary
-    print(f"\n{'-'*70}")
-    print(f"RESULTS SUMMARY")
-    print(f"{'-'*70}")
-    print(f"Configuration: {grid_size}x{grid_size} grid, {method_name} tiles")
-    print(f"Games played: {num_games}")
-    print(f"Total time: {elapsed_time:.2f}s (avg: {elapsed_time/num_games:.2f}s per game)")
-    print(f"\nScore Statistics:")
-    print(f"  Average: {sum(scores)/len(scores):.2f}")
-    print(f"  Min: {min(scores)}, Max: {max(scores)}")
-    print(f"\nMax Tile Statistics:")
-    print(f"  Average: {sum(max_tiles)/len(max_tiles):.2f}")
-    print(f"  Min: {min(max_tiles)}, Max: {max(max_tiles)}")
-    print(f"\nMove Statistics:")
-    print(f"  Average: {sum(moves)/len(moves):.2f}")
-    print(f"\nTile Achievement Rates:")
+    games_per_tile = Counter(max_tiles)
+    tile_counts = {t: sum(count for tile, count in games_per_tile.items() if tile >= t)
+                   for t in tile_thresholds}
+    
+    avg_score = sum(scores) / len(scores)
+    avg_max_tile = sum(max_tiles) / len(max_tiles)
+    top_tile = max(max_tiles)
+    
+    # Print summary; lines are collected and written in one go
+    summary = io.StringIO()
+    print(f"\n{'-'*70}", file=summary)
+    print(f"RESULTS SUMMARY", file=summary)
+    print(f"{'-'*70}", file=summary)
+    print(f"Configuration: {grid_size}x{grid_size} grid, {method_name} tiles", file=summary)
+    print(f"Games played: {num_games}", file=summary)
+    print(f"Total time: {elapsed_time:.2f}s (avg: {elapsed_time/num_games:.2f}s per game)", file=summary)
+    print(f"\nScore Statistics:", file=summary)
+    print(f"  Average: {avg_score:.2f}", file=summary)
+    print(f"  Min: {min(scores)}, Max: {max(scores)}", file=summary)
+    print(f"\nMax Tile Statistics:", file=summary)
+    print(f"  Average: {avg_max_tile:.2f}", file=summary)
+    print(f"  Min: {min(max_tiles)}, Max: {top_tile}", file=summary)
+    print(f"\nMove Statistics:", file=summary)
+    print(f"  Average: {sum(moves)/len(moves):.2f}", file=summary)
+    print(f"\nTile Achievement Rates:", file=summary)
     for tile, count in sorted(tile_counts.items()):
-        if tile <= max(max_tiles):  # Only show relevant tiles
-            print(f"  {tile:4d}+: {count:2d}/{num_games} ({100*count/num_games:5.1f}%)")
-    print(f"\nWin Rate (2048): {wins}/{num_games} ({100*wins/num_games:.1f}%)")
-    print(f"{'='*70}\n")
+        if tile <= top_tile:  # Only show relevant tiles
+            print(f"  {tile:4d}+: {count:2d}/{num_games} ({100*count/num_games:5.1f}%)", file=summary)
+    print(f"\nWin Rate (2048): {wins}/{num_games} ({100*wins/num_games:.1f}%)", file=summary)
+    print(f"{'='*70}\n", file=summary)
+    sys.stdout.write(summary.getvalue())
     
     return {
         'config': f"{grid_size}x{grid_size}_{method_name}",
-        'avg_score': sum(scores)/len(scores),
-        'avg_max_tile': sum(max_tiles)/len(max_tiles),
+        'avg_score': avg_score,
+        'avg_max_tile': avg_max_tile,
         'win_rate': wins/num_games,
         'tile_counts': tile_counts,
         'results': results
@@ -196,10 +349,8 @@ def main():
     print("Testing generalization across grid sizes and tile distributions")
     print("="*70)
     
-    # Create quiet Expectimax agent factory
-    # Note: We'll create agents with proper tile_distribution in run_experiment
-    ExpectimaxQuiet = ExpectimaxAgent
-    ExpectimaxQuiet.__name__ = "ExpectimaxAgent"
+    # Quiet Expectimax agents with the matching tile_distribution are created
+    # by make_agent, once per process, and reset between games
     
     # Create generation methods
     default_gen = Default()
@@ -214,7 +365,7 @@ def main():
     print("\n" + "#"*70)
     print("# EXPERIMENT 1: Baseline (Standard 4x4, Default Tiles)")
     print("#"*70)
-    baseline = run_experiment(ExpectimaxQuiet, grid_size=4, generation_method=default_gen, 
+    baseline = run_experiment(ExpectimaxAgent, grid_size=4, generation_method=default_gen, 
                               num_games=num_games, agent_name="Expectimax (Baseline)")
     all_results.append(('Baseline 4x4 Default', baseline))
     
@@ -224,7 +375,7 @@ def main():
     print("\n" + "#"*70)
     print("# EXPERIMENT 2: Modified Tile Distribution (4x4, Scaling Tiles)")
     print("#"*70)
-    modified_4x4 = run_experiment(ExpectimaxQuiet, grid_size=4, generation_method=scaling_gen,
+    modified_4x4 = run_experiment(ExpectimaxAgent, grid_size=4, generation_method=scaling_gen,
                                   num_games=num_games, agent_name="Expectimax (Scaling)")
     all_results.append(('4x4 Scaling Tiles', modified_4x4))
     
@@ -236,12 +387,12 @@ def main():
     print("#"*70)
     
     # 3x3 grid
-    small_grid = run_experiment(ExpectimaxQuiet, grid_size=5, generation_method=default_gen,
+    small_grid = run_experiment(ExpectimaxAgent, grid_size=5, generation_method=default_gen,
                                num_games=num_games, agent_name="Expectimax (5x5)")
     all_results.append(('5x5 Default', small_grid))
     
     # 5x5 grid
-    large_grid = run_experiment(ExpectimaxQuiet, grid_size=6, generation_method=default_gen,
+    large_grid = run_experiment(ExpectimaxAgent, grid_size=6, generation_method=default_gen,
                                num_games=num_games, agent_name="Expectimax (6x6)")
     all_results.append(('6x6 Default', large_grid))
     
@@ -253,12 +404,12 @@ def main():
     print("#"*70)
     
     # 3x3 with scaling tiles
-    small_scaling = run_experiment(ExpectimaxQuiet, grid_size=5, generation_method=scaling_gen,
+    small_scaling = run_experiment(ExpectimaxAgent, grid_size=5, generation_method=scaling_gen,
                                    num_games=num_games, agent_name="Expectimax (5x5 Scaling)")
     all_results.append(('5x5 Scaling', small_scaling))
     
     # 5x5 with scaling tiles
-    large_scaling = run_experiment(ExpectimaxQuiet, grid_size=6, generation_method=scaling_gen,
+    large_scaling = run_experiment(ExpectimaxAgent, grid_size=6, generation_method=scaling_gen,
                                    num_games=num_games, agent_name="Expectimax (6x6 Scaling)")
     all_results.append(('6x6 Scaling', large_scaling))
     